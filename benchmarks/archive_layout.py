@@ -0,0 +1,133 @@
+"""One JSON file per video vs the append-only transcript archive.
+
+Writes ``--videos`` synthetic transcripts of ``--segments`` segments (about
+an hour of captions each) in both layouts. Then it measures:
+- the disk usage;
+- a bulk read of every segment, as when re-summarizing a channel;
+- random lookups of single videos.
+Reads are done with the page cache of the files evicted first
+(``posix_fadvise``), then warm.
+
+    python benchmarks/archive_layout.py --videos 500 --segments 1200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_archive import INDEX_SUFFIX, ArchiveReader, TranscriptArchive
+
+WORDS = (
+    "the company reported revenue growth of twelve percent this quarter and margins improved while "
+    "guidance for next year remains cautious because of rates inflation dividend buyback valuation "
+    "so we think that the stock is still cheap compared to its peers in the sector"
+).split()
+
+
+def synthetic_segments(rng, count):
+    return [
+        {"text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))), "start": i * 3.2, "duration": 3.2}
+        for i in range(count)
+    ]
+
+
+def disk_usage(paths):
+    return sum(os.stat(path).st_blocks * 512 for path in paths)
+
+
+def evict(paths):
+    # Drops the cached pages of the files, so the next read goes to the disk
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--segments", type=int, default=1200)
+    parser.add_argument("--lookups", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    video_ids = [f"{i:011d}" for i in range(args.videos)]
+    transcripts = {video_id: synthetic_segments(rng, args.segments) for video_id in video_ids}
+    lookups = rng.sample(video_ids, min(args.lookups, len(video_ids)))
+
+    with tempfile.TemporaryDirectory(prefix="archive-layout-") as workdir:
+        files_dir = os.path.join(workdir, "files")
+        os.makedirs(files_dir)
+        archive_path = os.path.join(workdir, "channel.ytra")
+
+        start = time.perf_counter()
+        for video_id, segments in transcripts.items():
+            with open(os.path.join(files_dir, f"{video_id}.json"), "w", encoding="UTF-8") as f:
+                json.dump(segments, f, ensure_ascii=False)
+        files_write = time.perf_counter() - start
+        file_paths = [os.path.join(files_dir, f"{video_id}.json") for video_id in video_ids]
+
+        start = time.perf_counter()
+        with TranscriptArchive(archive_path) as archive:
+            for video_id, segments in transcripts.items():
+                archive.append(video_id, segments)
+        archive_write = time.perf_counter() - start
+        archive_paths = [archive_path, archive_path + INDEX_SUFFIX]
+
+        def read_files(ids):
+            count = 0
+            for video_id in ids:
+                with open(os.path.join(files_dir, f"{video_id}.json"), encoding="UTF-8") as f:
+                    count += len(json.load(f))
+            return count
+
+        def read_archive(ids=None):
+            count = 0
+            with ArchiveReader(archive_path) as reader:
+                if ids is None:
+                    for _, segments in reader:
+                        count += sum(1 for _ in segments)
+                else:
+                    for video_id in ids:
+                        count += sum(1 for _ in reader.segments(video_id))
+            return count
+
+        def timed(read, paths, *read_args):
+            evict(paths)
+            start = time.perf_counter()
+            count = read(*read_args)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            read(*read_args)
+            return count, cold, time.perf_counter() - start
+
+        total = args.videos * args.segments
+        print(f"{args.videos} videos x {args.segments} segments")
+        print(f"{'':<28} {'one file per video':>20} {'archive':>12}")
+        print(f"{'files':<28} {len(file_paths):>20} {len(archive_paths):>12}")
+        print(f"{'disk usage [MB]':<28} {disk_usage(file_paths) / 1024 / 1024:>20.1f} {disk_usage(archive_paths) / 1024 / 1024:>12.1f}")
+        print(f"{'write [s]':<28} {files_write:>20.2f} {archive_write:>12.2f}")
+
+        files_count, files_cold, files_warm = timed(read_files, file_paths, video_ids)
+        archive_count, archive_cold, archive_warm = timed(read_archive, archive_paths)
+        assert files_count == archive_count == total
+        print(f"{'bulk read, cold [s]':<28} {files_cold:>20.2f} {archive_cold:>12.2f}")
+        print(f"{'bulk read, warm [s]':<28} {files_warm:>20.2f} {archive_warm:>12.2f}")
+
+        files_count, files_cold, files_warm = timed(read_files, file_paths, lookups)
+        archive_count, archive_cold, archive_warm = timed(read_archive, archive_paths, lookups)
+        assert files_count == archive_count == len(lookups) * args.segments
+        print(f"{f'{len(lookups)} lookups, cold [ms/video]':<28} {files_cold / len(lookups) * 1000:>20.2f} {archive_cold / len(lookups) * 1000:>12.2f}")
+        print(f"{f'{len(lookups)} lookups, warm [ms/video]':<28} {files_warm / len(lookups) * 1000:>20.2f} {archive_warm / len(lookups) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Recovery of the transcript archive after torn writes and corruption.
+
+Writes ``--videos`` synthetic transcripts to an archive, then damages a
+copy of it in each scenario below and checks which records survive, and
+that their segments are read back unchanged:
+- data file cut in the middle of the last record (interrupted append);
+- index cut in the middle of its last entry;
+- last complete record missing from the index;
+- payload byte flipped in a record in the middle of the file;
+- header of a record in the middle of the file overwritten;
+- index deleted;
+- empty data file.
+After the recoveries done by opening the archive for writing, a new record
+is appended and must be readable too. The
+damaged offsets come from ``--seed``, so a failure can be replayed. Prints
+the surviving records and the recovery time per scenario, and exits with
+status 1 when a check fails.
+
+    python benchmarks/archive_recovery.py --videos 50 --seed 1
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_archive import (
+    INDEX_ENTRY, INDEX_SUFFIX, RECORD_HEADER, ArchiveReader, TranscriptArchive, rebuild_index,
+)
+
+
+def transcript(rng, number, segments):
+    return [
+        {"text": f"video {number} segment {i} " + " ".join(rng.choice("abcdefgh") * 3 for _ in range(8)),
+         "start": i * 2.5, "duration": 2.5}
+        for i in range(segments)
+    ]
+
+
+def readable(path):
+    # Records a reader gives back whole: {video_id: segments}. A corrupted
+    # record raises while being read and is left out
+    records = {}
+    with ArchiveReader(path) as reader:
+        for video_id in reader.video_ids():
+            try:
+                records[video_id] = list(reader.segments(video_id))
+            except ValueError:
+                pass
+    return records
+
+
+def flip(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    transcripts = {f"vid{number:08d}": transcript(rng, number, args.segments) for number in range(args.videos)}
+    ids = list(transcripts)
+    extra_id, extra = "appended0000", transcript(rng, args.videos, args.segments)
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="archive-recovery-") as workdir:
+        original = os.path.join(workdir, "original.yta")
+        offsets = {}
+        with TranscriptArchive(original) as archive:
+            for video_id, segments in transcripts.items():
+                offsets[video_id] = archive.append(video_id, segments)
+        size = os.path.getsize(original)
+
+        def end_of(video_id):
+            following = [offset for offset in offsets.values() if offset > offsets[video_id]]
+            return min(following) if following else size
+
+        middle = ids[rng.randrange(1, len(ids) - 1)]
+        middle_payload = offsets[middle] + RECORD_HEADER.size + len(middle)
+
+        def torn_tail(path):
+            cut = rng.randrange(offsets[ids[-1]] + 1, size)
+            with open(path, "r+b") as f:
+                f.truncate(cut)
+            return set(ids[:-1])
+
+        def torn_index_entry(path):
+            with open(path + INDEX_SUFFIX, "r+b") as f:
+                f.truncate(os.path.getsize(path + INDEX_SUFFIX) - rng.randrange(1, INDEX_ENTRY.size))
+            return set(ids)
+
+        def unindexed_record(path):
+            with open(path + INDEX_SUFFIX, "r+b") as f:
+                f.truncate(os.path.getsize(path + INDEX_SUFFIX) - INDEX_ENTRY.size)
+            return set(ids)
+
+        def flipped_payload(path):
+            flip(path, rng.randrange(middle_payload, end_of(middle)))
+            return set(ids) - {middle}
+
+        def overwritten_header(path):
+            with open(path, "r+b") as f:
+                f.seek(offsets[middle])
+                f.write(bytes(rng.randrange(256) for _ in range(RECORD_HEADER.size)))
+            return set(ids) - {middle}
+
+        def lost_index(path):
+            os.remove(path + INDEX_SUFFIX)
+            return set(ids)
+
+        def empty_file(path):
+            with open(path, "r+b") as f:
+                f.truncate(0)
+            os.remove(path + INDEX_SUFFIX)
+            return set()
+
+        # (label, damage, how the archive is reopened, append a record after)
+        scenarios = [
+            ("torn tail", torn_tail, "writer", True),
+            ("torn index entry", torn_index_entry, "writer", True),
+            ("unindexed record", unindexed_record, "writer", True),
+            ("flipped payload byte", flipped_payload, "reader", False),
+            ("flipped payload, rebuilt", flipped_payload, "rebuild", False),
+            ("overwritten header", overwritten_header, "rebuild", False),
+            ("lost index", lost_index, "reader", False),
+            ("empty data file", empty_file, "reader", False),
+        ]
+        print(f"{args.videos} video(s) of {args.segments} segment(s), {size / 1024:.0f} KB, seed {args.seed}")
+        print(f"{'scenario':<26} {'reopened by':<12} {'kept':>5} {'expected':>9} {'recovery [ms]':>14}  result")
+        for label, damage, reopen, append in scenarios:
+            path = os.path.join(workdir, f"{label.replace(' ', '-').replace(',', '')}.yta")
+            shutil.copyfile(original, path)
+            shutil.copyfile(original + INDEX_SUFFIX, path + INDEX_SUFFIX)
+            expected = damage(path)
+            start = time.perf_counter()
+            if reopen == "writer":
+                TranscriptArchive(path).close()
+            elif reopen == "rebuild":
+                rebuild_index(path)
+            else:
+                ArchiveReader(path).close()
+            recovery = time.perf_counter() - start
+            records = readable(path)
+            problems = []
+            if set(records) != expected:
+                problems.append(
+                    f"lost {sorted(expected - set(records))[:3]}, unexpected {sorted(set(records) - expected)[:3]}"
+                )
+            problems += [f"{video_id} changed" for video_id in expected & set(records) if records[video_id] != transcripts[video_id]]
+            if append:
+                with TranscriptArchive(path) as archive:
+                    archive.append(extra_id, extra)
+                after = readable(path)
+                if after.get(extra_id) != extra or set(after) != expected | {extra_id}:
+                    problems.append("record appended after recovery not readable")
+            print(
+                f"{label:<26} {reopen:<12} {len(records):>5} {len(expected):>9} {recovery * 1000:>14.2f}  "
+                + ("ok" if not problems else "FAILED: " + "; ".join(problems))
+            )
+            ok = ok and not problems
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Time a run spends archiving to S3, inline uploads vs the background archive.
+
+Runs against a local S3-compatible stub (``benchmarks/s3_stub.py``). First
+``--videos`` transcripts and summaries: one blocking ``put_object`` each,
+uncompressed, vs ``S3Archive`` (gzip, background uploads joined at the end).
+Then a single ``--large-mb`` transcript: one ``put_object`` vs a concurrent
+multipart upload. Every archived object is read back and compared.
+
+    python benchmarks/archive_upload.py --videos 20 --large-mb 64
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# After site-packages: the botocore vendored in package/ has no service data
+sys.path.append(os.path.join(ROOT, "package"))
+
+from s3_stub import S3Stub
+
+WORDS = (
+    "the company reported revenue growth of twelve percent this quarter and margins improved while "
+    "guidance for next year remains cautious because of rates inflation dividend buyback valuation"
+).split()
+
+
+def transcript(size, seed):
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--transcript-kb", type=int, default=150)
+    parser.add_argument("--large-mb", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--bandwidth-mb", type=float, default=20, help="per connection, in MB/s")
+    args = parser.parse_args()
+
+    from s3_archive import COMPRESS_LEVEL, MB, S3Archive
+
+    with S3Stub(latency=args.latency, bandwidth=args.bandwidth_mb * 1024 * 1024) as stub:
+        client = stub.client()
+        videos = [
+            (f"video{i:03d}", transcript(args.transcript_kb * 1024, i), f"<h2>Résumé {i}</h2>" + "<p>analyse</p>" * 500)
+            for i in range(args.videos)
+        ]
+
+        print(f"{args.videos} videos, {args.transcript_kb} KB transcripts")
+        print(f"{'':<24} {'blocked [s]':>12} {'joined [s]':>11} {'sent [MB]':>10}")
+        received = stub.bytes_received
+        start = time.perf_counter()
+        for video_id, text, summary in videos:
+            client.put_object(Bucket="archive", Key=f"inline/transcripts/{video_id}.txt", Body=text.encode())
+            client.put_object(Bucket="archive", Key=f"inline/summaries/{video_id}.html", Body=summary.encode())
+        blocked = time.perf_counter() - start
+        sent = (stub.bytes_received - received) / 1024 / 1024
+        print(f"{'inline put_object':<24} {blocked:>12.2f} {0.0:>11.2f} {sent:>10.2f}")
+
+        received = stub.bytes_received
+        archive = S3Archive("archive", "background/", client=client)
+        start = time.perf_counter()
+        for video_id, text, summary in videos:
+            archive.archive_transcript(video_id, text)
+            archive.archive_summary(video_id, summary)
+        blocked = time.perf_counter() - start
+        start = time.perf_counter()
+        uploaded, failed = archive.close()
+        joined = time.perf_counter() - start
+        sent = (stub.bytes_received - received) / 1024 / 1024
+        print(f"{'S3Archive (background)':<24} {blocked:>12.2f} {joined:>11.2f} {sent:>10.2f}")
+        assert not failed and len(uploaded) == 2 * args.videos
+        for video_id, text, summary in videos:
+            assert gzip.decompress(stub.objects[("archive", f"background/transcripts/{video_id}.txt.gz")]).decode() == text
+            assert stub.objects[("archive", f"background/summaries/{video_id}.html")].decode() == summary
+        assert stub.headers[("archive", f"background/transcripts/{videos[0][0]}.txt.gz")]["Content-Encoding"] == "gzip"
+
+        # One very long transcript: a single request vs concurrent parts
+        text = transcript(args.large_mb * 1024 * 1024, -1)
+        start = time.perf_counter()
+        data = gzip.compress(text.encode(), compresslevel=COMPRESS_LEVEL, mtime=0)
+        compression = time.perf_counter() - start
+        print(f"\n{args.large_mb} MB transcript, {len(data) / 1024 / 1024:.1f} MB compressed in {compression:.2f}s")
+        print(f"{'':<24} {'upload [s]':>11}")
+        start = time.perf_counter()
+        client.put_object(Bucket="archive", Key="inline/large.txt.gz", Body=data)
+        print(f"{'single put_object':<24} {time.perf_counter() - start:>11.2f}")
+        # Parts of 5 MB, the smallest S3 accepts
+        archive = S3Archive("archive", "background/", client=client, multipart_threshold=5 * MB, multipart_chunksize=5 * MB)
+        start = time.perf_counter()
+        archive.archive_transcript("large", text)
+        uploaded, failed = archive.close()
+        print(f"{'S3Archive multipart':<24} {time.perf_counter() - start - compression:>11.2f}")
+        assert not failed
+        assert stub.objects[("archive", "background/transcripts/large.txt.gz")] == data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Wall time and peak thread count of main (threads) vs async_main (one event loop).
+
+Both run against the local stand-ins of every service with ``--videos``
+new videos spread over ``--channels`` channels, each one on a fresh state,
+for each VIDEO_WORKERS value of ``--video-workers``.
+
+    python benchmarks/async_pipeline.py --videos 20 --channels 4 --video-workers 8 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_env import StubEnvironment
+
+
+class ThreadPeak:
+    # Highest number of live threads while the block runs
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            # The sampler itself is not counted
+            self.peak = max(self.peak, threading.active_count() - 1)
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--video-workers", type=int, nargs="+", default=[8, 20])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with StubEnvironment(args.channels, args.videos // args.channels) as env:
+        function = env.function
+        entry_points = {
+            "main (threads)": lambda: function.main(None, None),
+            "async_main": lambda: asyncio.run(function.async_main()),
+        }
+        print(f"{'VIDEO_WORKERS':>13} {'entry point':<16} {'median [s]':>10} {'min [s]':>8} {'peak threads':>13}")
+        for video_workers in args.video_workers:
+            function.VIDEO_WORKERS = video_workers
+            function._video_executor = None
+            timings = {label: [] for label in entry_points}
+            peaks = {label: 0 for label in entry_points}
+            for _ in range(args.runs):
+                for label, run in entry_points.items():
+                    env.reset()
+                    received = len(env.smtp.messages)
+                    start = time.perf_counter()
+                    # The JSON run report line is not part of the output
+                    with ThreadPeak() as threads, contextlib.redirect_stdout(io.StringIO()):
+                        run()
+                    timings[label].append(time.perf_counter() - start)
+                    peaks[label] = max(peaks[label], threads.peak)
+                    assert len(env.smtp.messages) - received == args.videos // args.channels * args.channels
+            for label, values in timings.items():
+                print(
+                    f"{video_workers:>13} {label:<16} {statistics.median(values):>10.2f} {min(values):>8.2f} "
+                    f"{peaks[label]:>13}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Throughput of a backfill over the history of several channels.
+
+Runs the real backfill entry point against local stand-ins of the YouTube
+Data API, the transcript endpoints (through proxy stubs) and OpenAI, with
+the OpenAI rate limits applied. A second run over the same checkpoint shows
+that nothing is processed twice.
+
+    python benchmarks/backfill.py --channels 2 --videos 100 --rpm 600
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_stub import OpenAIStub
+from proxy_stub import ProxyStub
+from transcript_stub import TranscriptStub
+from youtube_stub import YouTubeStub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--videos", type=int, default=100, help="uploads backfilled per channel")
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=0)
+    parser.add_argument("--proxies", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="backfill-benchmark-")
+    with YouTubeStub(uploads=args.videos * 2) as youtube, \
+            TranscriptStub(latency=0.05, connect_latency=0.05, segments=300) as transcripts, \
+            OpenAIStub(per_output_token=0.001) as openai:
+        proxies = [ProxyStub(latency=0.02, connect_latency=0.05).__enter__() for _ in range(args.proxies)]
+        transcripts.install()
+        os.environ["OPENAI_BASE_URL"] = openai.base_url
+        import youtube_summary_gcp as function
+
+        function.load_secrets = lambda: None
+        function.OPENAI_API_KEY = "fake-openai-key"
+        function.SENDER_EMAIL, function.SENDER_PASSWORD, function.RECIPIENT_EMAILS = "bench@example.com", "", []
+        function.CHANNEL_IDS = [f"UCbenchmarkchannel{i:04d}" for i in range(args.channels)]
+        function.proxy_urls = [proxy.url for proxy in proxies]
+        function.set_proxy_health(True)
+        youtube_client = youtube.client()
+        function.get_youtube_client = lambda: youtube_client
+        function.STATE_BACKEND, function.STATE_DB_PATH = "sqlite", os.path.join(workdir, "state.db")
+        function.SUMMARY_CACHE = "none"
+        function.BACKFILL_DIR = os.path.join(workdir, "summaries")
+        function.BACKFILL_CHECKPOINT = os.path.join(workdir, "checkpoint.json")
+        function.OPENAI_RPM_LIMIT, function.OPENAI_TPM_LIMIT = args.rpm, args.tpm
+
+        for run in ("first run", "resumed run"):
+            report = function.backfill(max_videos=args.videos)
+            print(f"{run}: {json.dumps(report)}")
+        print(f"YouTube API requests: {youtube.requests}, GPT requests: {openai.requests}, output in {workdir}")
+        for proxy in proxies:
+            proxy.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    main()
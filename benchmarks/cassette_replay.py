@@ -0,0 +1,129 @@
+"""Record a main() run once, then replay it with and without its timing.
+
+Records the HTTP traffic of one ``main`` run against the local stubs of
+``stub_env`` into a cassette. Then it compares the wall time and its spread
+over ``--runs`` runs: live against the stubs, replayed with the recorded
+timing, and replayed with no latency. It checks that the replays never
+reached the HTTP stubs. Last, it profiles a zero-latency replay with
+cProfile, in every thread (top functions by own time), and with tracemalloc
+(peak memory). SMTP is not recorded and still goes to the SMTP stub.
+
+    python benchmarks/cassette_replay.py --runs 5 --top 15
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cassette
+from stub_env import StubEnvironment
+
+
+def run_main(env, replay=None):
+    # One run on a fresh state, with the secrets and the proxy check done
+    # again, so every run makes the same requests
+    function = env.function
+    env.reset()
+    env.clear_secrets()
+    function._proxy_health["healthy"] = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), replay or contextlib.nullcontext():
+        function.main(None, None)
+    return time.perf_counter() - start
+
+
+def profile_threads(env, replay):
+    # cProfile only sees the thread it is enabled in: every thread started
+    # during the run gets its own profiler, and the pools kept by the module
+    # are dropped so that their threads are started again
+    function = env.function
+    function._video_executor = function._gpt_executor = function._proxy_executor = None
+    profilers = []
+
+    def start_profiler(*args):
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        profilers.append(profiler)
+        profiler.enable()
+
+    main_profiler = cProfile.Profile()
+    threading.setprofile(start_profiler)
+    main_profiler.enable()
+    try:
+        run_main(env, replay)
+    finally:
+        main_profiler.disable()
+        threading.setprofile(None)
+    stats = pstats.Stats(main_profiler)
+    for profiler in profilers:
+        profiler.disable()
+        stats.add(profiler)
+    return stats, len(profilers)
+
+
+def http_requests(env):
+    return sum(stub.requests for name, stub in env.stubs.items() if name != "smtp")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--new-videos", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with StubEnvironment(args.channels, args.new_videos, proxies=2) as env, \
+            tempfile.TemporaryDirectory(prefix="cassette-") as workdir:
+        path = os.path.join(workdir, "run.ytc")
+        recorder = cassette.recording(path)
+        recorded = run_main(env, recorder)
+        print(
+            f"Recorded {recorder.interactions} HTTP responses in {recorded:.2f}s, "
+            f"cassette {os.path.getsize(path) / 1024:.1f} KB"
+        )
+
+        print(f"{'':<26} {'mean [s]':>9} {'stdev [s]':>10} {'HTTP requests to stubs':>23}")
+        for label, make_replay in [
+            ("live", lambda: None),
+            ("replay, original timing", lambda: cassette.replaying(path, timing="original")),
+            ("replay, no latency", lambda: cassette.replaying(path, timing="none")),
+        ]:
+            before = http_requests(env)
+            times = [run_main(env, make_replay()) for _ in range(args.runs)]
+            print(
+                f"{label:<26} {statistics.mean(times):>9.3f} {statistics.stdev(times) if len(times) > 1 else 0.0:>10.3f} "
+                f"{http_requests(env) - before:>23}"
+            )
+
+        stats, threads = profile_threads(env, cassette.replaying(path, timing="none"))
+        print(f"\nReplay with no latency, {threads + 1} thread(s), top {args.top} functions by own time:")
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats("tottime").print_stats(args.top)
+        print("\n".join(line for line in stream.getvalue().splitlines()[6:] if line.strip()))
+
+        tracemalloc.start()
+        run_main(env, cassette.replaying(path, timing="none"))
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        print(f"\nReplay with no latency, tracemalloc peak: {peak / 1024 / 1024:.1f} MB, still allocated by file:")
+        for stat in snapshot.statistics("filename")[:5]:
+            print(f"  {stat}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Estimated prompt tokens before and after transcript compaction.
+
+Runs TranscriptCompactor over a corpus of transcripts: JSON files holding
+the segment list of ``fetched.to_raw_data()`` when ``--corpus`` is given,
+otherwise generated samples shaped like auto-generated and manual captions.
+
+    python benchmarks/compaction.py [--corpus transcripts/] [--budget 0]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_tools import TranscriptCompactor
+
+SENTENCES = [
+    "the company reported revenue growth of twelve percent this quarter",
+    "margins were under pressure because of higher energy costs",
+    "we think the valuation is still reasonable compared to its peers",
+    "the central bank could cut rates twice before the end of the year",
+    "free cash flow covers the dividend more than two times",
+    "management raised its guidance for the full year",
+]
+
+
+def auto_captions(words_count, rng):
+    # Rolling auto-captions: each segment repeats the end of the previous one,
+    # with markers and fillers in between
+    words = " ".join(rng.choice(SENTENCES) for _ in range(words_count // 10 + 1)).split()[:words_count]
+    segments = []
+    position = 0
+    while position < len(words):
+        size = rng.randint(4, 9)
+        overlap = rng.randint(2, 4) if segments else 0
+        segments.append({"text": " ".join(words[max(0, position - overlap):position + size])})
+        position += size
+        if rng.random() < 0.05:
+            segments.append({"text": rng.choice(["[Music]", "[Musique]", "[Applause]", "♪♪"])})
+        if rng.random() < 0.1:
+            segments.append({"text": rng.choice(["um", "uh", "euh", "so"])})
+    return segments
+
+
+def manual_captions(words_count, rng):
+    # Clean captions, one sentence per segment: compaction should keep them
+    segments = []
+    previous = None
+    for _ in range(words_count // 10 + 1):
+        sentence = rng.choice([sentence for sentence in SENTENCES if sentence != previous])
+        segments.append({"text": sentence + "."})
+        previous = sentence
+    return segments
+
+
+def sample_corpus(rng):
+    corpus = {}
+    for minutes in (10, 30, 90):
+        words_count = minutes * 150
+        corpus[f"auto-{minutes}min"] = auto_captions(words_count, rng)
+        corpus[f"manual-{minutes}min"] = manual_captions(words_count, rng)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of JSON transcripts (lists of segments)")
+    parser.add_argument("--budget", type=int, default=0, help="token budget, 0 for no limit")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = {}
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.json"))):
+            with open(path, encoding="UTF-8") as f:
+                corpus[os.path.basename(path)] = json.load(f)
+    else:
+        corpus = sample_corpus(random.Random(0))
+
+    total_before = total_after = 0
+    print(f"{'transcript':<20} {'segments':>9} {'tokens before':>14} {'tokens after':>13} {'saved':>7} {'time [ms]':>10}")
+    for name, segments in corpus.items():
+        compactor = TranscriptCompactor(token_budget=args.budget)
+        start = time.perf_counter()
+        compacted = list(compactor.compact(segments))
+        elapsed = time.perf_counter() - start
+        total_before += compactor.tokens_before
+        total_after += compactor.tokens_after
+        saved = 1 - compactor.tokens_after / max(1, compactor.tokens_before)
+        print(
+            f"{name:<20} {len(segments):>4}->{len(compacted):<4} {compactor.tokens_before:>14} "
+            f"{compactor.tokens_after:>13} {saved:>6.0%} {elapsed * 1000:>10.1f}"
+        )
+    print(f"{'total':<20} {'':>9} {total_before:>14} {total_after:>13} {1 - total_after / max(1, total_before):>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Near-duplicate index: build time, size and query latency.
+
+Fills a ``DedupeIndex`` with ``--videos`` synthetic transcripts of about
+``--words`` words each, drawn from a Zipf-like vocabulary. Then it queries:
+- re-uploads: a stored transcript, with its segments cut differently;
+- Shorts: ``--short-words`` consecutive words of a stored transcript;
+- part 2: the last 40% of a stored transcript followed by new text;
+- new videos: transcripts never stored.
+For each kind it prints the query latency (p50/p95), the overlap found and
+what the function would do with the default thresholds: skip the video,
+summarize its new segments only, or summarize it all.
+
+    python benchmarks/dedupe_index.py --videos 10000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedupe import DedupeIndex
+
+VOCABULARY = 20000
+SEGMENT_WORDS = 10
+# Defaults of youtube_summary_gcp
+SKIP_OVERLAP = 0.8
+PARTIAL_OVERLAP = 0.3
+
+_vocabulary = np.array([f"mot{i}" for i in range(VOCABULARY)])
+_weights = 1 / np.arange(1, VOCABULARY + 1)
+_weights /= _weights.sum()
+
+
+def words(seed, count):
+    rng = np.random.default_rng(seed)
+    return _vocabulary[rng.choice(VOCABULARY, count, p=_weights)].tolist()
+
+
+def segments(words, segment_words=SEGMENT_WORDS):
+    return [{"text": " ".join(words[i:i + segment_words])} for i in range(0, len(words), segment_words)]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--short-words", type=int, default=150)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for videos in args.videos:
+        index = DedupeIndex()
+        start = time.perf_counter()
+        # Generated on the fly, in batches, so the corpus is never held at once
+        for first in range(0, videos, 1000):
+            index.add_many(
+                (f"v{i:010d}", segments(words(i, args.words))) for i in range(first, min(first + 1000, videos))
+            )
+        build = time.perf_counter() - start
+        size = sum(keys.nbytes + blocks.nbytes for keys, blocks in zip(index._keys, index._blocks))
+
+        with tempfile.TemporaryDirectory(prefix="dedupe-index-") as workdir:
+            path = os.path.join(workdir, "index.npz")
+            start = time.perf_counter()
+            index.save(path)
+            save = time.perf_counter() - start
+            file_size = os.path.getsize(path)
+            start = time.perf_counter()
+            index = DedupeIndex.load(path)
+            load = time.perf_counter() - start
+
+        print(f"{videos} videos x {args.words} words: {index.block_count} blocks")
+        print(f"  build {build:.1f}s ({videos / build:.0f} videos/s), memory {size / 1024 / 1024:.0f} MB, "
+              f"file {file_size / 1024 / 1024:.0f} MB, save {save:.2f}s, load {load:.2f}s")
+
+        rng = np.random.default_rng(videos)
+        stored = rng.choice(videos, args.queries, replace=False).tolist()
+        kinds = {}
+        for n, i in enumerate(stored):
+            original = words(i, args.words)
+            new = words(10 ** 9 + n, args.words)
+            short_start = int(rng.integers(0, args.words - args.short_words))
+            kinds.setdefault("re-upload", []).append(segments(original, SEGMENT_WORDS + 3))
+            kinds.setdefault("Short", []).append(segments(original[short_start:short_start + args.short_words]))
+            kinds.setdefault("part 2", []).append(segments(original[args.words * 3 // 5:] + new[:args.words * 3 // 5]))
+            kinds.setdefault("new video", []).append(segments(new))
+
+        print(f"  {'':<10} {'p50 [ms]':>9} {'p95 [ms]':>9} {'overlap':>8} {'skipped':>8} {'partial':>8} {'full':>6}")
+        for kind, queries in kinds.items():
+            latencies, fractions = [], []
+            for query in queries:
+                start = time.perf_counter()
+                overlap = index.query(query)
+                latencies.append(time.perf_counter() - start)
+                fractions.append(overlap.fraction)
+            fractions = np.array(fractions)
+            skipped = np.mean(fractions >= SKIP_OVERLAP)
+            partial = np.mean((fractions >= PARTIAL_OVERLAP) & (fractions < SKIP_OVERLAP))
+            print(
+                f"  {kind:<10} {percentile(latencies, 50):>9.2f} {percentile(latencies, 95):>9.2f} "
+                f"{np.median(fractions):>8.2f} {skipped:>8.0%} {partial:>8.0%} {max(0.0, 1 - skipped - partial):>6.0%}"
+            )
+
+        start = time.perf_counter()
+        for n in range(20):
+            index.add(f"added{n}", segments(words(2 * 10 ** 9 + n, args.words)))
+        print(f"  add one transcript to the index: {(time.perf_counter() - start) / 20 * 1000:.1f} ms")
+        del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-video emails vs one digest per run.
+
+Sends synthetic summaries of ``--summary-kb`` each to the local SMTP stub
+(run in a child process, so its buffers are not measured), one email per
+video and then as a single digest. Reports the delivery time and the peak
+memory of the sending side (tracemalloc), for each number of videos.
+
+    python benchmarks/digest.py --videos 10 40 160 --summary-kb 30
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_stub import SMTPStub
+
+from digest import Digest
+from mailer import Mailer
+
+
+def serve_smtp(ports, stop):
+    with SMTPStub(handshake_latency=0.1, message_latency=0.01) as stub:
+        ports.put(stub.port)
+        stop.wait()
+
+
+def synthetic_summary(index, size):
+    paragraph = "<p>Le chiffre d'affaires progresse de <strong>12 %</strong> sur le trimestre.</p>\n"
+    body = paragraph * (size // len(paragraph) + 1)
+    return f"<html><body><h2>Résumé {index}</h2>{body}</body></html>"
+
+
+def measure(label, send, videos):
+    tracemalloc.start()
+    start = time.perf_counter()
+    messages = send()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{videos:>7} {label:<22} {messages:>4} message(s) {elapsed:7.2f}s  peak {peak / 1e6:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, nargs="+", default=[10, 40, 160])
+    parser.add_argument("--summary-kb", type=int, default=30)
+    args = parser.parse_args()
+    size = args.summary_kb * 1024
+
+    ports, stop = multiprocessing.Queue(), multiprocessing.Event()
+    server = multiprocessing.Process(target=serve_smtp, args=(ports, stop), daemon=True)
+    server.start()
+    port = ports.get()
+
+    def new_mailer():
+        return Mailer("127.0.0.1", port, "bench@example.com", "password", ["reader@example.com"], starttls=False)
+
+    print(f"{'videos':>7} {'mode':<22}")
+    for videos in args.videos:
+        def per_video():
+            # Summaries held as queued messages until the batch is sent
+            with new_mailer() as mailer:
+                for index in range(videos):
+                    mailer.queue(f"Résumé de la dernière vidéo: {index}", synthetic_summary(index, size))
+            return mailer.sent
+
+        def digest():
+            # Summaries spooled as produced, rendered while the message is sent
+            with new_mailer() as mailer, Digest(spill_threshold=256 * 1024) as digest:
+                for index in range(videos):
+                    digest.add(f"video{index:04d}", f"Vidéo {index}", synthetic_summary(index, size))
+                mailer.queue_stream("Résumés du jour", lambda: digest.iter_html("Résumés du jour"))
+                mailer.flush()
+            return mailer.sent
+
+        measure("one email per video", per_video, videos)
+        measure("digest", digest, videos)
+
+    stop.set()
+    server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Local stand-in for DynamoDB, for the state store of the AWS variant.
+
+Speaks the JSON protocol for ``GetItem`` and ``PutItem``, with the two
+condition expressions ``state_store.DynamoDBStateStore`` writes with:
+``attribute_not_exists(#n)`` and ``#n = :v``. A failed condition is answered
+with a ``ConditionalCheckFailedException``, like DynamoDB. Every request waits
+``latency``. Items are kept in memory in ``items``, by table and key, in the
+typed JSON format. ``resource()`` returns a boto3 DynamoDB resource pointed at
+it.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TARGET_PREFIX = "DynamoDB_20120810."
+NOT_EXISTS = re.compile(r"^attribute_not_exists\((#\w+)\)$")
+EQUALS = re.compile(r"^\(?(#\w+) = (:\w+)\)?$")
+
+
+class DynamoDBStub:
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self.items = {}
+        self.requests = 0
+        self.condition_failures = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def resource(self):
+        import boto3
+        return boto3.resource(
+            "dynamodb",
+            region_name="eu-central-1",
+            endpoint_url=self.url,
+            aws_access_key_id="fake",
+            aws_secret_access_key="fake",
+        )
+
+    @staticmethod
+    def _key(table, key):
+        return table, json.dumps(key, sort_keys=True)
+
+    def _condition_holds(self, item, request):
+        expression = request["ConditionExpression"]
+        names = request.get("ExpressionAttributeNames", {})
+        values = request.get("ExpressionAttributeValues", {})
+        match = NOT_EXISTS.match(expression)
+        if match:
+            return item is None or names[match.group(1)] not in item
+        match = EQUALS.match(expression)
+        if match:
+            return item is not None and item.get(names[match.group(1)]) == values[match.group(2)]
+        raise ValueError(f"Unsupported condition: {expression}")
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-amz-json-1.0")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def error(self, kind, message):
+                self.reply(400, {"__type": f"com.amazonaws.dynamodb.v20120810#{kind}", "message": message})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                time.sleep(stub.latency)
+                operation = self.headers.get("X-Amz-Target", "")[len(TARGET_PREFIX):]
+                with stub._lock:
+                    stub.requests += 1
+                if operation == "GetItem":
+                    with stub._lock:
+                        item = stub.items.get(stub._key(request["TableName"], request["Key"]))
+                    self.reply(200, {"Item": item} if item is not None else {})
+                elif operation == "PutItem":
+                    item = request["Item"]
+                    key = stub._key(request["TableName"], {"channel_id": item["channel_id"]})
+                    with stub._lock:
+                        holds = "ConditionExpression" not in request or stub._condition_holds(stub.items.get(key), request)
+                        if holds:
+                            stub.items[key] = item
+                        else:
+                            stub.condition_failures += 1
+                    if holds:
+                        self.reply(200, {})
+                    else:
+                        self.error("ConditionalCheckFailedException", "The conditional request failed")
+                else:
+                    self.error("UnknownOperationException", f"Unsupported operation: {operation}")
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
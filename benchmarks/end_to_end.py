@@ -0,0 +1,204 @@
+"""End-to-end benchmark of the function against local stand-ins of every service.
+
+Starts the stubs of ``stub_env`` (Secret Manager, YouTube Data API, proxies,
+transcript endpoints, OpenAI, SMTP) with the latencies of ``STUBS``, scaled
+by ``--latency-scale``, and ``--error-rate`` of the requests of every stub
+failing. Then it runs the real ``main`` (or ``main_async``) ``--runs``
+times. Each run starts on a fresh state with ``--new-videos`` new uploads
+per channel, and reads its secrets again as on a cold start. The spans of
+every run are gathered by name and printed per stage: count, p50, p95 and
+errors, with the videos summarized per minute.
+
+The results are compared with a baseline JSON file (``--baseline``, default
+``benchmarks/end_to_end_baseline.json``). A stage is flagged when its p95
+grew by more than ``--tolerance`` and by more than ``NOISE_MS``, and so is a
+drop of the videos per minute. ``--check`` exits with status 1 when something
+is flagged, ``--save-baseline`` writes the results as the new baseline.
+
+    python benchmarks/end_to_end.py --runs 5
+    python benchmarks/end_to_end.py --error-rate 0.05 --check
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_env import StubEnvironment
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "end_to_end_baseline.json")
+# Latencies in seconds, about those of the real services seen from a Cloud
+# Functions instance
+STUBS = {
+    "secrets": {"latency": 0.03},
+    "youtube": {"uploads": 50, "latency": 0.08},
+    "transcripts": {"segments": 300, "latency": 0.05, "connect_latency": 0.1},
+    "openai": {"base": 0.3, "per_output_token": 0.002},
+    "smtp": {"handshake_latency": 0.2, "message_latency": 0.02},
+    "proxy": {"latency": 0.03, "connect_latency": 0.08},
+}
+LATENCY_KEYS = ("latency", "connect_latency", "handshake_latency", "message_latency", "base", "per_output_token")
+# p95 changes smaller than this are noise, whatever the tolerance
+NOISE_MS = 20.0
+
+
+def stub_options(latency_scale, error_rate):
+    options = {}
+    for name, values in STUBS.items():
+        options[name] = {
+            key: value * latency_scale if key in LATENCY_KEYS else value for key, value in values.items()
+        }
+        options[name]["error_rate"] = error_rate
+    return options
+
+
+def percentile(values, q):
+    # Nearest rank
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))]
+
+
+def collect(runs):
+    durations = {}
+    errors = {}
+    for run in runs:
+        for span in [run.root] + run.spans:
+            durations.setdefault(span.name, []).append(span.duration)
+            errors[span.name] = errors.get(span.name, 0) + bool(span.error)
+    return {
+        name: {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "errors": errors[name],
+        }
+        for name, values in sorted(durations.items(), key=lambda item: -sum(item[1]))
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Returns the regressions, one line each
+    regressions = []
+    for name, stage in results["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        grown = stage["p95_ms"] - before["p95_ms"]
+        if stage["p95_ms"] > before["p95_ms"] * (1 + tolerance) and grown > NOISE_MS:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {stage['p95_ms']:.1f} ms")
+    if results["videos_per_minute"] < baseline["videos_per_minute"] * (1 - tolerance):
+        regressions.append(
+            f"throughput: {baseline['videos_per_minute']:.1f} -> {results['videos_per_minute']:.1f} videos/min"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--new-videos", type=int, default=3, help="new videos per channel and per run")
+    parser.add_argument("--entry-point", choices=["main", "main_async"], default="main")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the requests failing, on every stub")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative p95 growth flagged as a regression")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    config = {
+        "entry_point": args.entry_point,
+        "channels": args.channels,
+        "new_videos": args.new_videos,
+        "latency_scale": args.latency_scale,
+        "error_rate": args.error_rate,
+    }
+    options = stub_options(args.latency_scale, args.error_rate)
+    with StubEnvironment(
+        args.channels, args.new_videos, proxies=2,
+        secrets=options["secrets"], youtube=options["youtube"], transcripts=options["transcripts"],
+        openai=options["openai"], smtp=options["smtp"], proxy=options["proxy"],
+    ) as env:
+        function = env.function
+        import tracing
+
+        runs = []
+        end_run = tracing.end_run
+
+        def capture(run, tracer_provider=None):
+            runs.append(run)
+            end_run(run, tracer_provider)
+
+        tracing.end_run = capture
+        for number in range(args.runs):
+            if number:
+                env.reset()
+            env.clear_secrets()
+            # The report line printed by every run is not needed here
+            with contextlib.redirect_stdout(io.StringIO()):
+                if args.entry_point == "main":
+                    function.main(None, None)
+                else:
+                    asyncio.run(function.async_main())
+        tracing.end_run = end_run
+
+        elapsed = sum(run.root.duration for run in runs)
+        videos = sum(run.root.attributes.get("videos_summarized", 0) for run in runs)
+        results = {
+            "config": config,
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "videos": videos,
+            "videos_per_minute": round(videos / elapsed * 60, 1),
+            "injected_errors": {name: stub.errors for name, stub in env.stubs.items()},
+            "stages": collect(runs),
+        }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="UTF-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print(f"Baseline made with another configuration ({baseline['config']}), not compared")
+            baseline = None
+
+    print(
+        f"{args.runs} run(s) of {args.entry_point}, {videos} video(s) in {elapsed:.1f}s: "
+        f"{results['videos_per_minute']} videos/min"
+        + (f" (baseline {baseline['videos_per_minute']})" if baseline else "")
+    )
+    injected = {name: count for name, count in results["injected_errors"].items() if count}
+    if injected:
+        print(f"Injected errors: {injected}")
+    print(f"{'stage':<28} {'count':>6} {'p50 [ms]':>10} {'p95 [ms]':>10} {'errors':>7} {'baseline p95':>13}")
+    for name, stage in results["stages"].items():
+        before = baseline["stages"].get(name) if baseline else None
+        change = ""
+        if before:
+            change = f"{before['p95_ms']:>8.1f} {(stage['p95_ms'] / before['p95_ms'] - 1) if before['p95_ms'] else 0:>+5.0%}"
+        print(f"{name:<28} {stage['count']:>6} {stage['p50_ms']:>10.1f} {stage['p95_ms']:>10.1f} {stage['errors']:>7} {change:>13}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="UTF-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Local stand-in for the Cloud Storage JSON API, with object generations.
+
+Speaks the subset ``state_store.GCSStateStore`` uses: media downloads
+(``alt=media``, with the ``x-goog-generation`` header) and multipart uploads
+honouring ``ifGenerationMatch``, 0 meaning that the object must not exist.
+A failed precondition is answered with a 412, like Cloud Storage. Every
+request waits ``latency``. Objects are kept in memory in ``objects`` as
+``(generation, data)``. ``client()`` returns a ``storage.Client`` pointed at
+it, with anonymous credentials.
+"""
+import itertools
+import json
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DOWNLOAD_PATH = re.compile(r"^/(?:download/)?storage/v1/b/([^/]+)/o/(.+)$")
+UPLOAD_PATH = re.compile(r"^/upload/storage/v1/b/([^/]+)/o$")
+
+
+class GCSStub:
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.objects = {}
+        self.requests = 0
+        self.precondition_failures = 0
+        self._generations = itertools.count(1000)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def client(self):
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import storage
+        return storage.Client(
+            project="stub", credentials=AnonymousCredentials(), client_options={"api_endpoint": self.url}
+        )
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, payload=b"", headers=()):
+                if isinstance(payload, dict):
+                    payload = json.dumps(payload).encode()
+                    headers = [("Content-Type", "application/json")] + list(headers)
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def error(self, status, message):
+                self.reply(status, {"error": {"code": status, "message": message}})
+
+            def received(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                url = urlsplit(self.path)
+                query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                return url.path, query, body
+
+            def do_GET(self):
+                path, query, _ = self.received()
+                match = DOWNLOAD_PATH.match(path)
+                if not match or query.get("alt") != "media":
+                    self.error(400, f"Unsupported request: GET {self.path}")
+                    return
+                name = (match.group(1), unquote(match.group(2)))
+                with stub._lock:
+                    stored = stub.objects.get(name)
+                if stored is None:
+                    self.error(404, f"No such object: {name[0]}/{name[1]}")
+                    return
+                generation, data = stored
+                self.reply(200, data, [
+                    ("Content-Type", "application/octet-stream"),
+                    ("x-goog-generation", str(generation)),
+                    ("x-goog-metageneration", "1"),
+                ])
+
+            def do_POST(self):
+                path, query, body = self.received()
+                match = UPLOAD_PATH.match(path)
+                if not match or query.get("uploadType") != "multipart":
+                    self.error(400, f"Unsupported request: POST {self.path}")
+                    return
+                # multipart/related: the JSON metadata, then the content
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+                )
+                metadata, content = [part.get_payload(decode=True) for part in message.iter_parts()]
+                metadata = json.loads(metadata)
+                name = (match.group(1), metadata["name"])
+                with stub._lock:
+                    current = stub.objects.get(name, (0, None))[0]
+                    expected = query.get("ifGenerationMatch")
+                    if expected is not None and int(expected) != current:
+                        stub.precondition_failures += 1
+                        failed = True
+                    else:
+                        failed = False
+                        generation = next(stub._generations)
+                        stub.objects[name] = (generation, content)
+                if failed:
+                    self.error(412, "At least one of the pre-conditions you specified did not hold.")
+                    return
+                self.reply(200, {
+                    "kind": "storage#object",
+                    "bucket": name[0],
+                    "name": name[1],
+                    "generation": str(generation),
+                    "metageneration": "1",
+                    "size": str(len(content)),
+                    "contentType": metadata.get("contentType", "application/octet-stream"),
+                })
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,76 @@
+"""Import-time profile of the Cloud Function module, by top-level package.
+
+Runs a fresh interpreter with ``-X importtime`` and aggregates its report so
+the cold-start cost of each dependency is visible. ``--with-lazy`` also
+imports the dependencies that the function only loads on first use, to show
+what a full invocation still pays for.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --with-lazy --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = [
+    "google.cloud.secretmanager",
+    "openai",
+    "googleapiclient.discovery",
+    "youtube_transcript_api",
+]
+
+
+def run_importtime(statement):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(result.returncode)
+    return result.stderr.splitlines()
+
+
+def parse_importtime(lines):
+    # "import time:       self [us] |  cumulative | imported package"
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows):
+    totals = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="youtube_summary_gcp")
+    parser.add_argument("--with-lazy", action="store_true", help="also import the lazily loaded dependencies")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    modules = [args.module] + (LAZY_MODULES if args.with_lazy else [])
+    rows = parse_importtime(run_importtime("; ".join(f"import {module}" for module in modules)))
+    total_us = sum(self_us for _, self_us, _ in rows)
+
+    print(f"{len(rows)} modules imported in {total_us / 1000:.1f} ms")
+    print(f"{'package':<32} {'self [ms]':>10} {'share':>7}")
+    for package, self_us in by_package(rows)[:args.top]:
+        print(f"{package:<32} {self_us / 1000:10.1f} {self_us / total_us:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
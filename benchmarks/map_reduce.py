@@ -0,0 +1,53 @@
+"""Wall time of single-pass vs map-reduce summarization, by transcript length.
+
+Runs the real summarization code against the local OpenAI stub, with
+synthetic transcripts of increasing length.
+
+    python benchmarks/map_reduce.py --lengths 5000 20000 60000 120000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_stub import OpenAIStub
+
+
+def synthetic_segments(tokens):
+    # About 18 tokens per segment, like auto-generated captions
+    text = "the company reported revenue growth of twelve percent this quarter and"
+    count = tokens * 4 // len(text) + 1
+    return [{"text": text, "start": i * 3.0, "duration": 3.0} for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", type=int, nargs="+", default=[5000, 20000, 60000, 120000])
+    parser.add_argument("--per-input-token", type=float, default=0.0001)
+    parser.add_argument("--per-output-token", type=float, default=0.002)
+    args = parser.parse_args()
+
+    with OpenAIStub(per_input_token=args.per_input_token, per_output_token=args.per_output_token) as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        import youtube_summary_gcp as function
+        function.OPENAI_API_KEY = "fake-openai-key"
+
+        print(f"{'tokens':>8} {'single pass [s]':>16} {'map-reduce [s]':>16} {'GPT calls':>10}")
+        for tokens in args.lengths:
+            segments = synthetic_segments(tokens)
+
+            start = time.perf_counter()
+            function.summarize_with_gpt(" ".join(segment["text"] for segment in segments))
+            single_pass = time.perf_counter() - start
+
+            stub.requests = 0
+            start = time.perf_counter()
+            function.summarize_map_reduce(segments)
+            map_reduce = time.perf_counter() - start
+            print(f"{tokens:>8} {single_pass:>16.2f} {map_reduce:>16.2f} {stub.requests:>10}")
+
+
+if __name__ == "__main__":
+    main()
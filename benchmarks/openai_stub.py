@@ -0,0 +1,199 @@
+"""Local OpenAI-compatible chat completions server used by the benchmarks.
+
+Latency is modelled as ``base + prompt_tokens * per_input_token +
+completion_tokens * per_output_token`` so long prompts are slower to process,
+like the real API. Requests with ``"stream": true`` are answered with
+server-sent events, one chunk per token at ``per_output_token`` intervals.
+``trailing_tokens`` is the length of the chatter the model writes after the
+HTML document. ``rpm_limit`` / ``tpm_limit`` enforce per-minute limits like
+the API: requests over them are answered with a 429, without a Retry-After
+unless ``retry_after`` is set. ``burst_seconds`` of the limit can be spent at
+once. ``error_rate`` of the requests are answered with a 500, after ``base``.
+Point the function at it with ``OPENAI_BASE_URL``.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OpenAIStub:
+    def __init__(self, base=0.05, per_input_token=0.000005, per_output_token=0.001, completion_tokens=300, trailing_tokens=0,
+                 rpm_limit=0, tpm_limit=0, burst_seconds=60.0, retry_after=False, error_rate=0.0):
+        self.base = base
+        self.per_input_token = per_input_token
+        self.per_output_token = per_output_token
+        self.completion_tokens = completion_tokens
+        self.trailing_tokens = trailing_tokens
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.burst_seconds = burst_seconds
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.throttled = 0
+        # Remaining requests and tokens, refilled continuously
+        self._remaining = [rpm_limit * burst_seconds / 60, tpm_limit * burst_seconds / 60]
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def completion_text(self, prompt):
+        body = " ".join(["lorem"] * max(1, self.completion_tokens - 8))
+        if "HTML" in prompt:
+            trailer = " ".join(["N'hésitez pas"] * (self.trailing_tokens // 2))
+            return f"```html\n<html><body><h2>Résumé</h2><p>{body}</p></body></html>\n```\n{trailer}"
+        return body
+
+    def admit(self, tokens):
+        # Seconds until the request fits in the limits, 0 if it is admitted
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for index, limit in enumerate((self.rpm_limit, self.tpm_limit)):
+                if limit:
+                    capacity = limit * self.burst_seconds / 60
+                    self._remaining[index] = min(capacity, self._remaining[index] + (now - self._refilled) * limit / 60)
+                    amount = 1 if index == 0 else tokens
+                    if self._remaining[index] < min(amount, capacity):
+                        wait = max(wait, (min(amount, capacity) - self._remaining[index]) * 60 / limit)
+            self._refilled = now
+            if wait:
+                self.throttled += 1
+                return wait
+            if self.rpm_limit:
+                self._remaining[0] -= 1
+            if self.tpm_limit:
+                self._remaining[1] -= tokens
+            return 0.0
+
+    def tokens(self, text):
+        # Pieces of about one token each, as streamed by the API
+        pieces = text.split(" ")
+        return [piece + " " for piece in pieces[:-1]] + pieces[-1:]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = "".join(message["content"] for message in request["messages"])
+                prompt_tokens = len(prompt) // 4
+                wait = stub.admit(prompt_tokens + request.get("max_tokens", stub.completion_tokens))
+                if wait:
+                    self.throttle(wait)
+                    return
+                with stub._lock:
+                    failed = random.random() < stub.error_rate
+                    stub.errors += failed
+                if failed:
+                    time.sleep(stub.base)
+                    self.fail()
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                    stub.prompt_tokens += prompt_tokens
+                text = stub.completion_text(prompt)
+                if request.get("stream"):
+                    self.stream(request, prompt_tokens, text)
+                    return
+                time.sleep(
+                    stub.base + prompt_tokens * stub.per_input_token
+                    + len(stub.tokens(text)) * stub.per_output_token
+                )
+                payload = json.dumps({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(stub.tokens(text)),
+                        "total_tokens": prompt_tokens + len(stub.tokens(text)),
+                    },
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def fail(self):
+                payload = json.dumps({"error": {
+                    "message": "The server had an error while processing your request.",
+                    "type": "server_error",
+                    "code": None,
+                }}).encode()
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def throttle(self, wait):
+                payload = json.dumps({"error": {
+                    "message": "Rate limit reached for requests",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }}).encode()
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if stub.retry_after:
+                    self.send_header("retry-after-ms", str(int(wait * 1000)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def stream(self, request, prompt_tokens, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                time.sleep(stub.base + prompt_tokens * stub.per_input_token)
+                pieces = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in stub.tokens(text)]
+                start = time.perf_counter()
+                try:
+                    for index, delta in enumerate(pieces):
+                        # Paced on a fixed schedule, so sleep overhead doesn't add up
+                        delay = start + index * stub.per_output_token - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                        chunk = {
+                            "id": "chatcmpl-stub",
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": request["model"],
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading early
+                    pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,63 @@
+"""Latency the proxy health check adds to each invocation.
+
+Compares the historical blocking probe at the start of every invocation
+with the cached, background health check, over a series of warm
+invocations. The probe goes through a local proxy stub to a local upstream.
+
+    python benchmarks/proxy_health.py --invocations 20 --detection-time 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_stub import IPHandler, ProxyStub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invocations", type=int, default=20)
+    parser.add_argument("--detection-time", type=float, default=0.2, help="seconds spent checking the channels")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--connect-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), IPHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    test_url = f"http://127.0.0.1:{upstream.server_port}/json"
+
+    with ProxyStub(latency=args.latency, connect_latency=args.connect_latency) as stub:
+        import youtube_summary_gcp as function
+        function.PROXY_TEST_URL = test_url
+        function.proxy_urls = [stub.url]
+
+        # Historical behaviour: a blocking probe, on a new connection, before any work
+        blocked = 0.0
+        for _ in range(args.invocations):
+            start = time.perf_counter()
+            requests.get(test_url, proxies={"http": stub.url, "https": stub.url}, timeout=10)
+            blocked += time.perf_counter() - start
+            time.sleep(args.detection_time)
+        print(f"{'blocking probe':<24} {blocked / args.invocations * 1000:8.1f} ms blocked per invocation")
+
+        # Background probe, overlapped with the channel checks and cached
+        blocked = 0.0
+        for _ in range(args.invocations):
+            function.check_proxy_in_background()
+            time.sleep(args.detection_time)
+            start = time.perf_counter()
+            function.proxy_is_healthy()
+            blocked += time.perf_counter() - start
+        print(f"{'cached background probe':<24} {blocked / args.invocations * 1000:8.1f} ms blocked per invocation")
+
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
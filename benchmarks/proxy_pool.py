@@ -0,0 +1,77 @@
+"""Fetch throughput through the proxy pool vs a single hard-coded proxy.
+
+Starts three local proxy stubs (fast, slow, flaky) in front of a local
+upstream and runs the same number of parallel fetches through one proxy,
+then through a ProxyPool holding the three, with retries on another
+endpoint when a fetch fails.
+
+    python benchmarks/proxy_pool.py --fetches 60 --workers 12
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_stub import IPHandler, ProxyStub
+from proxy_pool import ProxyPool
+
+
+def fetch(pool, url, served):
+    tried = []
+    while True:
+        with pool.acquire(exclude=tried) as proxy:
+            start = time.perf_counter()
+            try:
+                r = proxy.session.get(url, timeout=10)
+                r.raise_for_status()
+            except Exception:
+                pool.record(proxy, time.perf_counter() - start, False)
+                tried.append(proxy)
+                if len(tried) == len(pool.endpoints):
+                    return False
+                continue
+            pool.record(proxy, time.perf_counter() - start, True)
+            served[proxy.host] += 1
+            return True
+
+
+def run(label, pool, url, fetches, workers):
+    served = Counter()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        ok = sum(executor.map(lambda _: fetch(pool, url, served), range(fetches)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed:6.2f} s  {ok}/{fetches} ok  served={dict(served)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fetches", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=12)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), IPHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{upstream.server_port}/json"
+
+    with ProxyStub(latency=0.05, connect_latency=0.05, error_rate=0.3) as flaky, \
+            ProxyStub(latency=0.05, connect_latency=0.05) as fast, \
+            ProxyStub(latency=0.3, connect_latency=0.05) as slow:
+        run("single proxy", ProxyPool([flaky.url], max_concurrency=args.max_concurrency), url, args.fetches, args.workers)
+        pool = ProxyPool([flaky.url, fast.url, slow.url], max_concurrency=args.max_concurrency)
+        run("proxy pool", pool, url, args.fetches, args.workers)
+        for stats in pool.stats():
+            print(f"  {stats}")
+
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of concurrent GPT calls against an OpenAI stub enforcing an RPM limit.
+
+Compares the OpenAI client's own retries (``max_retries=2``, no client-side
+limit, the previous behaviour) with the shared rate limiter and jittered
+backoff of ``complete()``, first with the limit unknown (adaptive rate), then
+with ``OPENAI_RPM_LIMIT`` set to the limit of the stub.
+
+    python benchmarks/rate_limit.py --calls 150 --workers 8 --rpm 600
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_stub import OpenAIStub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--burst-seconds", type=float, default=1.0)
+    parser.add_argument("--retry-after", action="store_true", help="the stub sends a Retry-After with its 429s")
+    args = parser.parse_args()
+    # The warnings of every retry are not part of the output
+    logging.disable(logging.WARNING)
+
+    with OpenAIStub(base=0.05, per_output_token=0.0002, rpm_limit=args.rpm,
+                    burst_seconds=args.burst_seconds, retry_after=args.retry_after) as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        from openai import OpenAI
+        import youtube_summary_gcp as function
+        function.OPENAI_API_KEY = "fake-openai-key"
+        function.GPT_STREAM = False
+        prompt = function.chunk_notes_prompt("the company reported revenue growth " * 400, 1, 1)
+
+        scenarios = {
+            "client retries": (0, 1, OpenAI(api_key=function.OPENAI_API_KEY, max_retries=2)),
+            "adaptive + backoff": (0, function.OPENAI_MAX_ATTEMPTS, None),
+            "RPM limit + backoff": (args.rpm, function.OPENAI_MAX_ATTEMPTS, None),
+        }
+        print(f"stub limit: {args.rpm} RPM ({args.rpm / 60:.1f}/s), {args.calls} calls over {args.workers} threads")
+        print(f"{'':<20} {'ok':>5} {'failed':>7} {'429s':>6} {'wall [s]':>9} {'calls/s':>8}")
+        for label, (rpm, attempts, client) in scenarios.items():
+            function.OPENAI_RPM_LIMIT = rpm
+            function.OPENAI_MAX_ATTEMPTS = attempts
+            function._gpt_rate_limiter = None
+            function._openai_client = client
+            # Full bucket and a quiet stub before each scenario
+            time.sleep(args.burst_seconds + 1)
+            stub.throttled = 0
+
+            def call(_):
+                try:
+                    function.complete(prompt)
+                    return True
+                except Exception:
+                    return False
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                results = list(executor.map(call, range(args.calls)))
+            elapsed = time.perf_counter() - start
+            ok = sum(results)
+            print(f"{label:<20} {ok:>5} {args.calls - ok:>7} {stub.throttled:>6} {elapsed:>9.2f} {ok / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Structured report of a main() run, and its OpenTelemetry spans.
+
+Runs main against local stand-ins of every service (YouTube Data API,
+proxy, transcript endpoints, OpenAI, SMTP), with a few new videos per
+channel. The JSON report line is printed by the run itself. The spans are
+then exported to an in-memory OpenTelemetry exporter (opentelemetry-sdk
+needed) and printed as a tree.
+
+    python benchmarks/run_report.py --channels 2 --new-videos 3
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_env import StubEnvironment
+
+
+def print_tree(spans):
+    children = {}
+    for span in spans:
+        parent = span.parent.span_id if span.parent else None
+        children.setdefault(parent, []).append(span)
+
+    def walk(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda span: span.start_time):
+            duration = (span.end_time - span.start_time) / 1e9
+            print(f"{'  ' * depth}{span.name:<{40 - 2 * depth}} {duration * 1000:8.1f} ms")
+            walk(span.context.span_id, depth + 1)
+
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--new-videos", type=int, default=3, help="new videos per channel")
+    parser.add_argument("--digest", action="store_true", help="EMAIL_MODE=digest")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    email_mode = "digest" if args.digest else "per_video"
+    with StubEnvironment(args.channels, args.new_videos, proxies=1, email_mode=email_mode) as env:
+        function = env.function
+        import tracing
+
+        try:
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+            from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        except ImportError:
+            function.main(None, None)
+            print("opentelemetry-sdk is not installed, spans not exported")
+            return
+
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        end_run = tracing.end_run
+        tracing.end_run = lambda run: end_run(run, provider)
+        function.main(None, None)
+        spans = exporter.get_finished_spans()
+        print(f"\n{len(spans)} span(s) exported, {len(env.smtp.messages)} email(s) received")
+        print_tree(spans)
+
+
+if __name__ == "__main__":
+    main()
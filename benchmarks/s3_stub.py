@@ -0,0 +1,139 @@
+"""Local S3-compatible server used by the benchmarks.
+
+Speaks the path-style subset of the S3 API that uploads need: PutObject,
+CreateMultipartUpload, UploadPart, CompleteMultipartUpload,
+AbortMultipartUpload and GetObject. Each request waits ``latency``, and its
+body is received at ``bandwidth`` bytes/s, like a single connection to S3.
+Objects are kept in memory in ``objects``, their headers in ``headers``.
+Point a boto3 client at it with ``endpoint_url=stub.url``.
+"""
+import hashlib
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+class S3Stub:
+    def __init__(self, latency=0.02, bandwidth=50 * 1024 * 1024):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.headers = {}
+        self.requests = 0
+        self.bytes_received = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def client(self, max_pool_connections=10):
+        import boto3
+        from botocore.config import Config
+        return boto3.client(
+            "s3",
+            region_name="eu-central-1",
+            endpoint_url=self.url,
+            aws_access_key_id="fake",
+            aws_secret_access_key="fake",
+            config=Config(s3={"addressing_style": "path"}, max_pool_connections=max_pool_connections),
+        )
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def target(self):
+                url = urlsplit(self.path)
+                bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+                query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+                return (bucket, key), query
+
+            def body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                data = self.rfile.read(length)
+                time.sleep(stub.latency + length / stub.bandwidth)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_received += length
+                return data
+
+            def reply(self, status=200, payload=b"", headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_PUT(self):
+                name, query = self.target()
+                data = self.body()
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+                with stub._lock:
+                    if "uploadId" in query:
+                        stub._uploads[query["uploadId"]]["parts"][int(query["partNumber"])] = data
+                    else:
+                        stub.objects[name] = data
+                        stub.headers[name] = dict(self.headers)
+                self.reply(headers=[("ETag", etag)])
+
+            def do_POST(self):
+                name, query = self.target()
+                request = self.body()
+                bucket, key = name
+                if "uploads" in query:
+                    upload_id = uuid.uuid4().hex
+                    with stub._lock:
+                        stub._uploads[upload_id] = {"parts": {}, "headers": dict(self.headers)}
+                    self.reply(payload=(
+                        f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                        f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                    ).encode())
+                    return
+                numbers = [int(number) for number in re.findall(rb"<PartNumber>(\d+)</PartNumber>", request)]
+                with stub._lock:
+                    upload = stub._uploads.pop(query["uploadId"])
+                    stub.objects[name] = b"".join(upload["parts"][number] for number in sorted(numbers))
+                    stub.headers[name] = upload["headers"]
+                self.reply(payload=(
+                    f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                    f'<ETag>"{uuid.uuid4().hex}-{len(numbers)}"</ETag></CompleteMultipartUploadResult>'
+                ).encode())
+
+            def do_DELETE(self):
+                _, query = self.target()
+                self.body()
+                with stub._lock:
+                    stub._uploads.pop(query.get("uploadId"), None)
+                self.reply(204)
+
+            def do_GET(self):
+                name, _ = self.target()
+                with stub._lock:
+                    data = stub.objects.get(name)
+                if data is None:
+                    self.reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+                    return
+                self.reply(payload=data)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,102 @@
+"""Cold-start cost of loading the function secrets, against a fake Secret Manager.
+
+Compares the historical pattern (one new client and one serial round trip per
+secret) with the shared client + parallel fetch, and with a warm invocation
+served from the in-process TTL cache.
+
+    python benchmarks/secret_cold_start.py --latency 0.05 --client-setup 0.1
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FAKE_SECRETS = {
+    "YOUTUBE_API_KEY": "fake-youtube-key",
+    "OPENAI_API_KEY": "fake-openai-key",
+    "SENDER_PWD": "fake-password",
+    "CHANNEL_ID": "UC0000000000000000000000",
+    "USERNAME_PROXY": "user",
+    "PASSWORD_PROXY": "password",
+    "SENDER_EMAIL": "sender@example.com",
+    "RECIPIENT_EMAILS": json.dumps(["recipient@example.com"]),
+    "LAST_VIDEO_ID": "",
+}
+
+
+class FakeSecretManagerClient:
+    client_setup = 0.0
+    latency = 0.0
+    clients = 0
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self):
+        time.sleep(self.client_setup)
+        with self._lock:
+            FakeSecretManagerClient.clients += 1
+
+    def access_secret_version(self, name):
+        time.sleep(self.latency)
+        with self._lock:
+            FakeSecretManagerClient.calls += 1
+        secret_id = name.split("/")[3]
+        return SimpleNamespace(payload=SimpleNamespace(data=FAKE_SECRETS[secret_id].encode("UTF-8")))
+
+    def add_secret_version(self, parent, payload):
+        time.sleep(self.latency)
+        FAKE_SECRETS[parent.split("/")[3]] = payload["data"].decode("UTF-8")
+
+    @classmethod
+    def reset(cls):
+        cls.clients = 0
+        cls.calls = 0
+
+
+def report(label, elapsed):
+    print(
+        f"{label:<28} {elapsed * 1000:8.1f} ms  "
+        f"clients={FakeSecretManagerClient.clients}  calls={FakeSecretManagerClient.calls}"
+    )
+    FakeSecretManagerClient.reset()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per access_secret_version")
+    parser.add_argument("--client-setup", type=float, default=0.1, help="seconds to build a client")
+    args = parser.parse_args()
+    FakeSecretManagerClient.latency = args.latency
+    FakeSecretManagerClient.client_setup = args.client_setup
+
+    from google.cloud import secretmanager
+    secretmanager.SecretManagerServiceClient = FakeSecretManagerClient
+
+    import youtube_summary_gcp as function
+    FakeSecretManagerClient.reset()
+
+    # Historical behaviour: a new client and a serial round trip per secret
+    start = time.perf_counter()
+    for secret_id in function.SECRET_IDS:
+        client = FakeSecretManagerClient()
+        client.access_secret_version(name=f"projects/p/secrets/{secret_id}/versions/latest")
+    report("serial, one client each", time.perf_counter() - start)
+
+    function._secret_client = None
+    function._secret_cache.clear()
+    start = time.perf_counter()
+    function.load_secrets()
+    report("shared client, parallel", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    function.load_secrets()
+    report("warm (TTL cache)", time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
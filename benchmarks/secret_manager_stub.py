@@ -0,0 +1,90 @@
+"""Local stand-in for the Secret Manager REST API.
+
+Serves ``versions/latest:access`` for the ``secrets`` it is given, like the
+REST transport of ``google-cloud-secret-manager`` expects. ``client()``
+returns a ``SecretManagerServiceClient`` pointed at it, with anonymous
+credentials. ``latency`` is added to every request, and ``error_rate`` of
+them are answered with a 503, which the client retries.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ACCESS_PATH = re.compile(r"^/v1/projects/([^/]+)/secrets/([^/]+)/versions/([^/:]+):access$")
+
+
+class SecretManagerStub:
+    def __init__(self, secrets, latency=0.03, error_rate=0.0):
+        self.secrets = dict(secrets)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def client(self):
+        from google.api_core.client_options import ClientOptions
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import secretmanager
+        return secretmanager.SecretManagerServiceClient(
+            credentials=AnonymousCredentials(),
+            transport="rest",
+            client_options=ClientOptions(api_endpoint=self.base_url),
+        )
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    failed = random.random() < stub.error_rate
+                    stub.errors += failed
+                if failed:
+                    self.reply(503, {"error": {"code": 503, "message": "The service is currently unavailable.", "status": "UNAVAILABLE"}})
+                    return
+                match = ACCESS_PATH.match(self.path.split("?", 1)[0])
+                if not match or match.group(2) not in stub.secrets:
+                    self.reply(404, {"error": {"code": 404, "message": f"Secret not found: {self.path}", "status": "NOT_FOUND"}})
+                    return
+                project, secret_id, _ = match.groups()
+                data = stub.secrets[secret_id].encode("UTF-8")
+                self.reply(200, {
+                    "name": f"projects/{project}/secrets/{secret_id}/versions/1",
+                    "payload": {"data": base64.b64encode(data).decode("ascii")},
+                })
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
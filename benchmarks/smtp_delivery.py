@@ -0,0 +1,51 @@
+"""Messages/sec of one SMTP connection per email vs the batched Mailer.
+
+    python benchmarks/smtp_delivery.py --messages 50 --handshake-latency 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smtp_stub import SMTPStub
+from mailer import Mailer
+
+BODY = "<html><body><h2>Résumé</h2><p>" + "Lorem ipsum dolor sit amet. " * 200 + "</p></body></html>"
+
+
+def new_mailer(stub):
+    return Mailer("127.0.0.1", stub.port, "sender@example.com", "password", ["recipient@example.com"], starttls=False)
+
+
+def report(label, stub, count, elapsed):
+    print(f"{label:<28} {count / elapsed:8.1f} msg/s  {elapsed:6.2f} s  connections={stub.connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--handshake-latency", type=float, default=0.3)
+    parser.add_argument("--message-latency", type=float, default=0.01)
+    parser.add_argument("--drop-after", type=int, default=0, help="server drops the connection every N messages")
+    args = parser.parse_args()
+
+    with SMTPStub(args.handshake_latency, args.message_latency, args.drop_after) as stub:
+        # Historical behaviour: a new connection, STARTTLS and login per email
+        start = time.perf_counter()
+        for i in range(args.messages):
+            with new_mailer(stub) as mailer:
+                mailer.queue(f"Summary {i}", BODY)
+        report("one connection per email", stub, args.messages, time.perf_counter() - start)
+
+    with SMTPStub(args.handshake_latency, args.message_latency, args.drop_after) as stub:
+        start = time.perf_counter()
+        with new_mailer(stub) as mailer:
+            for i in range(args.messages):
+                mailer.queue(f"Summary {i}", BODY)
+        report("batched, one connection", stub, args.messages, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
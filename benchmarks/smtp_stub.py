@@ -0,0 +1,98 @@
+"""Minimal local SMTP server used by the benchmarks.
+
+Speaks just enough SMTP for ``smtplib`` (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT), without TLS. ``handshake_latency`` is added to the
+greeting and to AUTH to account for the TCP, STARTTLS and login round trips of
+a real server, ``message_latency`` to every DATA command. ``error_rate`` of
+the messages are dropped with the connection before being acknowledged, and
+the mailer sends them again over a new one.
+"""
+import random
+import socketserver
+import threading
+import time
+
+
+class SMTPStub:
+    def __init__(self, handshake_latency=0.1, message_latency=0.01, drop_after=0, error_rate=0.0):
+        self.handshake_latency = handshake_latency
+        self.message_latency = message_latency
+        # Close the connection after this many messages (0: never), to
+        # exercise reconnections
+        self.drop_after = drop_after
+        self.error_rate = error_rate
+        self.errors = 0
+        self.connections = 0
+        self.messages = []
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                with stub._lock:
+                    stub.connections += 1
+                received = 0
+                time.sleep(stub.handshake_latency / 2)
+                self.reply("220 localhost SMTP stub")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self.reply("250-localhost")
+                        self.reply("250 AUTH PLAIN LOGIN")
+                    elif verb == "AUTH":
+                        time.sleep(stub.handshake_latency / 2)
+                        self.reply("235 Authentication successful")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        data = []
+                        while True:
+                            line = self.rfile.readline()
+                            if not line:
+                                # Connection closed in the middle of DATA:
+                                # the message is discarded, as by a real server
+                                return
+                            if line == b".\r\n":
+                                break
+                            data.append(line)
+                        time.sleep(stub.message_latency)
+                        with stub._lock:
+                            failed = random.random() < stub.error_rate
+                            stub.errors += failed
+                        if failed:
+                            return
+                        with stub._lock:
+                            stub.messages.append(b"".join(data))
+                        self.reply("250 OK")
+                        received += 1
+                        if stub.drop_after and received >= stub.drop_after:
+                            return
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,119 @@
+"""Overlapping invocations claiming the same videos, on every state store.
+
+Runs ``--invocations`` threads at once, each claiming the same ``--videos``
+new video IDs on each of ``--channels`` channels, as overlapping runs of the
+function would. This is done for ``--rounds`` rounds of new IDs, on:
+- SQLite (local file);
+- Cloud Storage, against ``gcs_stub`` (generation preconditions);
+- DynamoDB, against ``dynamodb_stub`` (conditional puts).
+It checks that every video was claimed by exactly one invocation, and prints
+the time per claim and the compare-and-swap conflicts.
+
+    python benchmarks/state_store_cas.py --invocations 8 --videos 3
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state_store
+from dynamodb_stub import DynamoDBStub
+from gcs_stub import GCSStub
+
+
+def run(store, args):
+    conflicts = [0]
+    lock = threading.Lock()
+    compare_and_swap = store.compare_and_swap
+
+    def counted(channel_id, version, processed_ids):
+        swapped = compare_and_swap(channel_id, version, processed_ids)
+        if not swapped:
+            with lock:
+                conflicts[0] += 1
+        return swapped
+
+    store.compare_and_swap = counted
+    claims = {}
+    durations = []
+    failures = 0
+
+    def invocation(number, video_ids):
+        claimed = []
+        for channel in range(args.channels):
+            channel_id = f"UCchannel{channel:04d}"
+            start = time.perf_counter()
+            claimed += [(channel_id, video_id) for video_id in store.claim(channel_id, video_ids)]
+            durations.append(time.perf_counter() - start)
+        return number, claimed
+
+    with ThreadPoolExecutor(max_workers=args.invocations) as executor:
+        for round_number in range(args.rounds):
+            video_ids = [f"r{round_number:03d}v{i:02d}" for i in range(args.videos)]
+            futures = [executor.submit(invocation, n, video_ids) for n in range(args.invocations)]
+            for future in futures:
+                try:
+                    number, claimed = future.result()
+                except RuntimeError:
+                    failures += 1
+                    continue
+                for video in claimed:
+                    claims.setdefault(video, []).append(number)
+    expected = args.rounds * args.videos * args.channels
+    duplicates = sum(len(owners) - 1 for owners in claims.values())
+    return {
+        "p50_ms": statistics.median(durations) * 1000,
+        "max_ms": max(durations) * 1000,
+        "conflicts": conflicts[0],
+        "claims": sum(len(owners) for owners in claims.values()),
+        "expected": expected,
+        "duplicates": duplicates,
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invocations", type=int, default=8)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--videos", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="of the GCS and DynamoDB stubs, in seconds")
+    args = parser.parse_args()
+    # The pools of the storage clients are smaller than --invocations
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{args.invocations} overlapping invocations, {args.channels} channel(s), "
+          f"{args.videos} new video(s) per round, {args.rounds} round(s)")
+    print(f"{'backend':<10} {'p50 [ms]':>9} {'max [ms]':>9} {'conflicts':>10} {'claims':>7} {'expected':>9} "
+          f"{'duplicates':>11} {'gave up':>8}")
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="state-store-") as workdir, \
+            GCSStub(latency=args.latency) as gcs, DynamoDBStub(latency=args.latency) as dynamodb:
+        stores = {
+            "sqlite": state_store.SQLiteStateStore(os.path.join(workdir, "state.db")),
+            "gcs": state_store.GCSStateStore("state-bucket", client=gcs.client()),
+            "dynamodb": state_store.DynamoDBStateStore("YouTubeSummaryState", resource=dynamodb.resource()),
+        }
+        for name, store in stores.items():
+            result = run(store, args)
+            print(
+                f"{name:<10} {result['p50_ms']:>9.1f} {result['max_ms']:>9.1f} {result['conflicts']:>10} "
+                f"{result['claims']:>7} {result['expected']:>9} {result['duplicates']:>11} {result['failures']:>8}"
+            )
+            ok = ok and not result["duplicates"] and (result["failures"] or result["claims"] == result["expected"])
+        print(f"Stub precondition failures: gcs {gcs.precondition_failures}, dynamodb {dynamodb.condition_failures}")
+    if not ok:
+        print("FAILED: a video was claimed twice, or not at all")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
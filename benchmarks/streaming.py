@@ -0,0 +1,52 @@
+"""Summary latency with a blocking vs a streamed completion, by answer length.
+
+Runs summarize_with_gpt against the local OpenAI stub, which answers like
+the model does: the HTML document in a code fence, followed by
+``--trailing-tokens`` of chatter that the streamed mode never waits for.
+
+    python benchmarks/streaming.py --completion-tokens 300 1000 3000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai_stub import OpenAIStub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--completion-tokens", type=int, nargs="+", default=[300, 1000, 3000])
+    parser.add_argument("--trailing-tokens", type=int, default=200)
+    parser.add_argument("--per-output-token", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with OpenAIStub(per_output_token=args.per_output_token, trailing_tokens=args.trailing_tokens) as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+        import youtube_summary_gcp as function
+        function.OPENAI_API_KEY = "fake-openai-key"
+        transcript = "the company reported revenue growth of twelve percent this quarter " * 200
+        # Client creation and first connection, not part of the comparison
+        function.summarize_with_gpt(transcript)
+
+        print(f"{'tokens':>8} {'blocking [s]':>13} {'streamed [s]':>13}  same document")
+        for tokens in args.completion_tokens:
+            stub.completion_tokens = tokens
+            function.GPT_STREAM = False
+            start = time.perf_counter()
+            blocking = function.summarize_with_gpt(transcript)
+            blocking_time = time.perf_counter() - start
+
+            function.GPT_STREAM = True
+            start = time.perf_counter()
+            streamed = function.summarize_with_gpt(transcript)
+            streamed_time = time.perf_counter() - start
+
+            document = blocking[:blocking.index("</html>") + len("</html>")]
+            print(f"{tokens:>8} {blocking_time:>13.2f} {streamed_time:>13.2f}  {streamed == document}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Local stand-ins of every service, wired into the function module.
+
+``StubEnvironment`` starts the Secret Manager, YouTube Data API, proxy,
+transcript, OpenAI and SMTP stubs and points ``youtube_summary_gcp`` at them.
+The secrets (channels, proxy credentials, sender) are served by the Secret
+Manager stub and loaded by the function itself. Clients, SQLite state and no
+summary cache are set on the module. The state is seeded so that each
+channel has ``new_videos`` uploads to process. ``reset()`` seeds a fresh
+state for another run. The keyword arguments of each stub (latency, error
+rate...) are passed as dicts.
+"""
+import json
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+from openai_stub import OpenAIStub
+from proxy_stub import IPHandler, ProxyStub
+from secret_manager_stub import SecretManagerStub
+from smtp_stub import SMTPStub
+from transcript_stub import TranscriptStub
+from youtube_stub import YouTubeStub
+
+
+class StubEnvironment:
+    def __init__(self, channels=2, new_videos=3, proxies=3, email_mode="per_video",
+                 youtube=None, transcripts=None, openai=None, smtp=None, proxy=None, secrets=None):
+        self.channels = channels
+        self.new_videos = new_videos
+        self.email_mode = email_mode
+        self.workdir = tempfile.mkdtemp(prefix="stub-env-")
+        self.runs = 0
+        self.youtube = YouTubeStub(**(youtube or {"uploads": 50}))
+        self.transcripts = TranscriptStub(**(transcripts or {"segments": 300}))
+        self.openai = OpenAIStub(**(openai or {}))
+        self.smtp = SMTPStub(**(smtp or {"handshake_latency": 0.05}))
+        self.proxies = [ProxyStub(**(proxy or {"latency": 0.02, "connect_latency": 0.05})) for _ in range(proxies)]
+        self.secrets = SecretManagerStub(self.secret_values(), **(secrets or {}))
+        self.upstream = ThreadingHTTPServer(("127.0.0.1", 0), IPHandler)
+        self.function = None
+
+    @property
+    def stubs(self):
+        return {
+            "secret_manager": self.secrets,
+            "youtube": self.youtube,
+            "transcripts": self.transcripts,
+            "openai": self.openai,
+            "smtp": self.smtp,
+            **{f"proxy{i}": proxy for i, proxy in enumerate(self.proxies)},
+        }
+
+    def secret_values(self):
+        return {
+            "YOUTUBE_API_KEY": "fake-youtube-key",
+            "OPENAI_API_KEY": "fake-openai-key",
+            "SENDER_PWD": "password",
+            "CHANNEL_ID": ",".join(f"UCstubchannel{i:04d}" for i in range(self.channels)),
+            "USERNAME_PROXY": "user",
+            "PASSWORD_PROXY": "password",
+            "SENDER_EMAIL": "bench@example.com",
+            "RECIPIENT_EMAILS": json.dumps(["reader@example.com"]),
+        }
+
+    def __enter__(self):
+        for stub in self.stubs.values():
+            stub.__enter__()
+        threading.Thread(target=self.upstream.serve_forever, daemon=True).start()
+        self.transcripts.install()
+        os.environ["OPENAI_BASE_URL"] = self.openai.base_url
+        import youtube_summary_gcp as function
+        self.function = function
+
+        function._secret_client = self.secrets.client()
+        function.PROXY_HOSTS = [f"127.0.0.1:{proxy.server.server_port}" for proxy in self.proxies]
+        self.clear_secrets()
+        function.load_secrets()
+        function.SMTP_SERVER, function.SMTP_PORT, function.SMTP_STARTTLS = "127.0.0.1", self.smtp.port, False
+        function.PROXY_TEST_URL = f"http://127.0.0.1:{self.upstream.server_port}/json"
+        youtube_client = self.youtube.client()
+        function.get_youtube_client = lambda: youtube_client
+        function.YOUTUBE_API_URL = self.youtube.base_url + "youtube/v3"
+        function.SUMMARY_CACHE = "none"
+        function.EMAIL_MODE = self.email_mode
+        function.STATE_BACKEND = "sqlite"
+        self.reset()
+        return self
+
+    def clear_secrets(self):
+        # The next load_secrets() reads every secret from the stub again, as
+        # on a cold start
+        with self.function._secret_lock:
+            self.function._secret_cache.clear()
+
+    def reset(self):
+        # New state: the upload just older than the new ones was processed by
+        # a previous run
+        function = self.function
+        self.runs += 1
+        function.STATE_DB_PATH = os.path.join(self.workdir, f"state-{self.runs}.db")
+        function._state_store = None
+        for channel_id in function.CHANNEL_IDS:
+            function.get_state_store().claim(channel_id, [self.youtube.video_id(channel_id, self.new_videos)])
+
+    def __exit__(self, *exc_info):
+        self.upstream.shutdown()
+        for stub in self.stubs.values():
+            stub.__exit__(*exc_info)
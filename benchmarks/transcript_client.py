@@ -0,0 +1,68 @@
+"""Per-video transcript latency: new YouTubeTranscriptApi per video vs the shared client.
+
+Runs sequential fetches through a local proxy stub to a local stand-in of
+the YouTube transcript endpoints. The shared client is the one the proxy
+pool keeps per endpoint and per thread, on the keep-alive connections of the
+endpoint.
+
+    python benchmarks/transcript_client.py --videos 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_stub import ProxyStub
+from transcript_stub import TranscriptStub
+from proxy_pool import ProxyPool
+
+
+def measure(label, fetch, videos, stubs):
+    timings = []
+    for i in range(videos):
+        start = time.perf_counter()
+        fetch(f"video{i:05d}")
+        timings.append(time.perf_counter() - start)
+    connections = ", ".join(f"{name}={stub.connections}" for name, stub in stubs.items())
+    print(
+        f"{label:<28} mean {statistics.mean(timings) * 1000:7.1f} ms  "
+        f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:7.1f} ms  connections: {connections}"
+    )
+    for stub in stubs.values():
+        stub.connections = 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--connect-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api.proxies import GenericProxyConfig
+
+    with TranscriptStub(args.latency, args.connect_latency) as youtube, \
+            ProxyStub(latency=0.0, connect_latency=args.connect_latency) as proxy:
+        youtube.install()
+        stubs = {"proxy": proxy, "youtube": youtube}
+
+        # Historical behaviour: a new client, session and connections per video
+        def new_client_per_video(video_id):
+            config = GenericProxyConfig(http_url=proxy.url, https_url=proxy.url)
+            YouTubeTranscriptApi(proxy_config=config).fetch(video_id)
+
+        endpoint = ProxyPool([proxy.url]).endpoints[0]
+
+        def shared_client(video_id):
+            endpoint.transcript_api.fetch(video_id)
+
+        measure("new client per video", new_client_per_video, args.videos, stubs)
+        measure("shared client", shared_client, args.videos, stubs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Local stand-in for the YouTube endpoints used by youtube-transcript-api.
+
+Serves the watch page, the innertube player API and the timedtext captions
+over plain HTTP. ``install()`` points youtube-transcript-api at it.
+``connect_latency`` is paid once per client connection (TCP + TLS with
+YouTube), ``latency`` on every request. ``error_rate`` of the requests are
+answered with a 503, retried by the HTTP session of the proxy endpoint.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+
+class TranscriptStub:
+    def __init__(self, latency=0.02, connect_latency=0.1, segments=600, error_rate=0.0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.segments = segments
+        self.error_rate = error_rate
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def install(self):
+        from youtube_transcript_api import _transcripts
+        _transcripts.WATCH_URL = self.base_url + "/watch?v={video_id}"
+        _transcripts.INNERTUBE_API_URL = self.base_url + "/youtubei/v1/player?key={api_key}"
+
+    def captions(self, video_id):
+        lines = "".join(
+            f'<text start="{i * 3.0}" dur="3.0">{escape(f"segment {i} of video {video_id}, the market went up")}</text>'
+            for i in range(self.segments)
+        )
+        return f'<?xml version="1.0" encoding="utf-8" ?><transcript>{lines}</transcript>'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                time.sleep(stub.connect_latency)
+
+            def reply(self, payload, content_type):
+                payload = payload.encode("UTF-8")
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    failed = random.random() < stub.error_rate
+                    stub.errors += failed
+                if failed:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                video_id = parse_qs(url.query).get("v", ["unknown"])[0]
+                if url.path == "/watch":
+                    self.reply('<html><script>ytcfg.set({"INNERTUBE_API_KEY": "stub-key"})</script></html>', "text/html")
+                else:
+                    self.reply(stub.captions(video_id), "text/xml")
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                video_id = request["videoId"]
+                self.reply(json.dumps({
+                    "playabilityStatus": {"status": "OK"},
+                    "captions": {"playerCaptionsTracklistRenderer": {
+                        "captionTracks": [{
+                            "baseUrl": f"{stub.base_url}/api/timedtext?v={video_id}&lang=en",
+                            "name": {"runs": [{"text": "English (auto-generated)"}]},
+                            "languageCode": "en",
+                            "kind": "asr",
+                        }],
+                    }},
+                }), "application/json")
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
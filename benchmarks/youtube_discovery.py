@@ -0,0 +1,50 @@
+"""Cost of getting a YouTube Data API client, built on every call or cached.
+
+Compares, per invocation:
+- ``build()`` on every call (the historical behaviour), which parses the
+  discovery document bundled with googleapiclient each time,
+- the cached client that warm instances reuse.
+Neither makes a discovery HTTP call: ``build()`` uses the bundled document
+(``static_discovery=True``).
+
+    python benchmarks/youtube_discovery.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(label, func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<32} median {statistics.median(timings) * 1000:8.2f} ms  max {max(timings) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    from googleapiclient.discovery import build
+    import youtube_summary_gcp as function
+    function.YOUTUBE_API_KEY = "fake-youtube-key"
+
+    def build_every_call():
+        build("youtube", "v3", developerKey=function.YOUTUBE_API_KEY, static_discovery=True).search()
+
+    def cached_client():
+        function.get_youtube_client().search()
+
+    measure("build() every call", build_every_call, args.runs)
+    measure("cached client", cached_client, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Local stand-in for the YouTube Data API calls made by the function.
+
+Serves ``playlistItems.list`` (paged, 50 items per page) and ``videos.list``
+for ``uploads`` synthetic videos per channel, newest first. ``client()``
+returns a googleapiclient client pointed at it, to replace
+``get_youtube_client``. ``error_rate`` of the requests are answered with a
+503 (backendError), which the function does not retry.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class YouTubeStub:
+    def __init__(self, uploads=200, latency=0.05, error_rate=0.0):
+        self.uploads = uploads
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/"
+
+    def client(self):
+        from googleapiclient.discovery import build
+        return build(
+            "youtube", "v3", developerKey="fake-youtube-key", static_discovery=True,
+            client_options={"api_endpoint": self.base_url},
+        )
+
+    @staticmethod
+    def video_id(channel_id, index):
+        # index 0 is the newest upload
+        return f"{channel_id[-4:]}v{index:06d}"
+
+    def playlist_items(self, query):
+        channel_id = "UC" + query["playlistId"][0][2:]
+        offset = int(query.get("pageToken", ["0"])[0])
+        size = int(query.get("maxResults", ["5"])[0])
+        indexes = range(offset, min(offset + size, self.uploads))
+        response = {
+            "items": [
+                {"snippet": {
+                    "title": f"Video {index} of {channel_id}",
+                    "resourceId": {"kind": "youtube#video", "videoId": self.video_id(channel_id, index)},
+                }}
+                for index in indexes
+            ],
+        }
+        if offset + size < self.uploads:
+            response["nextPageToken"] = str(offset + size)
+        return response
+
+    def videos(self, query):
+        return {
+            "items": [
+                {"id": video_id, "snippet": {"title": f"Video {video_id}", "liveBroadcastContent": "none"}}
+                for video_id in query["id"][0].split(",")
+            ],
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    failed = random.random() < stub.error_rate
+                    stub.errors += failed
+                if failed:
+                    status = 503
+                    payload = {"error": {"code": 503, "message": "Backend Error", "errors": [{"reason": "backendError"}]}}
+                elif url.path.endswith("/playlistItems"):
+                    status, payload = 200, stub.playlist_items(query)
+                else:
+                    status, payload = 200, stub.videos(query)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,337 @@
+"""Record and replay of the HTTP traffic of a run, at the transport level.
+
+``recording(path)`` captures every response received through httplib2
+(``googleapiclient``), ``requests.adapters.HTTPAdapter`` (transcripts, proxy
+probe, Cloud Storage, and the vendored ``requests`` of the AWS variant when it
+is the one imported) and httpx transports (``openai``). ``replaying(path)``
+serves them back without any network access. ``timing="original"`` waits
+as long as the recorded responses took, and streamed httpx responses keep the
+pace of their chunks. ``timing="none"`` answers at once, to profile the CPU and
+memory cost of the pipeline alone. SMTP and gRPC calls are not covered.
+
+A cassette is a gzip stream of frames. Each frame is a ``FRAME_HEADER``
+with the length of a JSON header and of the response body, followed by both.
+It is written as responses come and read as requests come: a replay only
+holds the frames read ahead of the request being answered. Requests are
+matched on their transport, method, URL and a digest of their body, in
+recorded order for identical requests. The ``key`` query parameter (API
+keys) is removed from the URLs, and request headers are never stored.
+"""
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Length of the JSON header, length of the body
+FRAME_HEADER = struct.Struct("<II")
+MAGIC = b"YTC1"
+# Query parameters never stored nor matched
+REDACTED_PARAMS = {"key"}
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def _url(url):
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in REDACTED_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.rpartition("@")[2], parts.path, urlencode(query), ""))
+
+
+def _digest(body):
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode("UTF-8")
+    if not isinstance(body, (bytes, bytearray)):
+        # Streamed upload, not matched on
+        return None
+    return hashlib.sha1(body).hexdigest()[:16] if body else None
+
+
+class Cassette:
+    def __init__(self, path, mode, timing="original"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if timing not in ("original", "none"):
+            raise ValueError(f"Unknown cassette timing: {timing}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.interactions = 0
+        self._lock = threading.Lock()
+        self._file = None
+        # Frames read ahead, by request key
+        self._pending = {}
+        self._patches = []
+
+    # Writing
+
+    def _write(self, key, status, reason, headers, body, elapsed, chunks=None):
+        header = {
+            "k": list(key),
+            "s": status,
+            "r": reason,
+            "h": headers,
+            "e": round(elapsed, 6),
+        }
+        if chunks is not None:
+            # [size, seconds since the request] of every streamed chunk
+            header["c"] = chunks
+        header = json.dumps(header, separators=(",", ":")).encode("UTF-8")
+        with self._lock:
+            self._file.write(FRAME_HEADER.pack(len(header), len(body)) + header + body)
+            self.interactions += 1
+
+    # Reading
+
+    def _read_frame(self):
+        lengths = self._file.read(FRAME_HEADER.size)
+        if len(lengths) < FRAME_HEADER.size:
+            return None
+        header_length, body_length = FRAME_HEADER.unpack(lengths)
+        header = json.loads(self._file.read(header_length))
+        header["body"] = self._file.read(body_length)
+        return header
+
+    def _take(self, key):
+        with self._lock:
+            frames = self._pending.get(key)
+            while not frames:
+                frame = self._read_frame()
+                if frame is None:
+                    raise CassetteMiss(f"No recorded response for {key[1]} {key[2]} ({key[0]})")
+                self._pending.setdefault(tuple(frame["k"]), deque()).append(frame)
+                frames = self._pending.get(key)
+            self.interactions += 1
+            return frames.popleft()
+
+    def _wait(self, seconds):
+        if self.timing == "original" and seconds > 0:
+            time.sleep(seconds)
+
+    async def _async_wait(self, seconds):
+        if self.timing == "original" and seconds > 0:
+            await asyncio.sleep(seconds)
+
+    # Transports
+
+    def _patch(self, owner, name, replacement):
+        self._patches.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def _patch_httplib2(self):
+        try:
+            import httplib2
+        except ImportError:
+            return
+        cassette = self
+        original = httplib2.Http.request
+
+        def request(http, uri, method="GET", body=None, headers=None, *args, **kwargs):
+            key = ("httplib2", method, _url(uri), _digest(body))
+            if cassette.mode == "replay":
+                frame = cassette._take(key)
+                cassette._wait(frame["e"])
+                response = httplib2.Response(dict(frame["h"]))
+                response.reason = frame["r"]
+                return response, frame["body"]
+            start = time.perf_counter()
+            response, content = original(http, uri, method, body, headers, *args, **kwargs)
+            cassette._write(key, response.status, response.reason, list(response.items()), content, time.perf_counter() - start)
+            return response, content
+
+        self._patch(httplib2.Http, "request", request)
+
+    def _patch_requests(self):
+        try:
+            import requests.adapters
+            from requests.models import Response
+            from requests.structures import CaseInsensitiveDict
+            from requests.utils import get_encoding_from_headers
+        except ImportError:
+            return
+        cassette = self
+        original = requests.adapters.HTTPAdapter.send
+
+        def send(adapter, request, *args, **kwargs):
+            key = ("requests", request.method, _url(request.url), _digest(request.body))
+            if cassette.mode == "replay":
+                frame = cassette._take(key)
+                cassette._wait(frame["e"])
+                response = Response()
+                response.status_code = frame["s"]
+                response.reason = frame["r"]
+                response.headers = CaseInsensitiveDict(frame["h"])
+                response.encoding = get_encoding_from_headers(response.headers)
+                # Decoded already: the body is not decompressed again
+                response._content = frame["body"]
+                response._content_consumed = True
+                response.raw = io.BytesIO(frame["body"])
+                response.url = request.url
+                response.request = request
+                response.connection = adapter
+                return response
+            start = time.perf_counter()
+            response = original(adapter, request, *args, **kwargs)
+            # Read here even for stream=True, the body is kept in the response
+            content = response.content
+            cassette._write(
+                key, response.status_code, response.reason, list(response.headers.items()), content,
+                time.perf_counter() - start,
+            )
+            return response
+
+        self._patch(requests.adapters.HTTPAdapter, "send", send)
+
+    def _patch_httpx(self):
+        try:
+            import httpx
+        except ImportError:
+            return
+        cassette = self
+        original = httpx.HTTPTransport.handle_request
+        original_async = httpx.AsyncHTTPTransport.handle_async_request
+
+        def httpx_key(request):
+            return ("httpx", request.method, _url(str(request.url)), _digest(request.content))
+
+        def headers(response):
+            return [[k.decode("latin-1"), v.decode("latin-1")] for k, v in response.headers.raw]
+
+        def chunks_of(frame):
+            body = frame["body"]
+            position = 0
+            for size, offset in frame["c"]:
+                yield body[position:position + size], offset
+                position += size
+
+        class ReplayStream(httpx.SyncByteStream):
+            def __init__(self, frame):
+                self.frame = frame
+
+            def __iter__(self):
+                start = time.perf_counter()
+                for chunk, offset in chunks_of(self.frame):
+                    cassette._wait(offset - (time.perf_counter() - start))
+                    yield chunk
+
+        class AsyncReplayStream(httpx.AsyncByteStream):
+            def __init__(self, frame):
+                self.frame = frame
+
+            async def __aiter__(self):
+                start = time.perf_counter()
+                for chunk, offset in chunks_of(self.frame):
+                    await cassette._async_wait(offset - (time.perf_counter() - start))
+                    yield chunk
+
+        class RecordingStream(httpx.SyncByteStream):
+            # Passes the chunks on as they come, and writes the frame once
+            # the response is closed
+            def __init__(self, key, response, start):
+                self.key, self.response, self.start = key, response, start
+                self.elapsed = time.perf_counter() - start
+                self.chunks, self.sizes = [], []
+
+            def __iter__(self):
+                for chunk in self.response.stream:
+                    self.chunks.append(chunk)
+                    self.sizes.append([len(chunk), round(time.perf_counter() - self.start, 6)])
+                    yield chunk
+
+            def close(self):
+                self.response.close()
+                cassette._write(
+                    self.key, self.response.status_code, None, headers(self.response), b"".join(self.chunks),
+                    self.elapsed, self.sizes,
+                )
+
+        class AsyncRecordingStream(httpx.AsyncByteStream):
+            def __init__(self, key, response, start):
+                self.key, self.response, self.start = key, response, start
+                self.elapsed = time.perf_counter() - start
+                self.chunks, self.sizes = [], []
+
+            async def __aiter__(self):
+                async for chunk in self.response.stream:
+                    self.chunks.append(chunk)
+                    self.sizes.append([len(chunk), round(time.perf_counter() - self.start, 6)])
+                    yield chunk
+
+            async def aclose(self):
+                await self.response.aclose()
+                cassette._write(
+                    self.key, self.response.status_code, None, headers(self.response), b"".join(self.chunks),
+                    self.elapsed, self.sizes,
+                )
+
+        def handle_request(transport, request):
+            key = httpx_key(request)
+            if cassette.mode == "replay":
+                frame = cassette._take(key)
+                cassette._wait(frame["e"])
+                return httpx.Response(frame["s"], headers=frame["h"], stream=ReplayStream(frame))
+            start = time.perf_counter()
+            response = original(transport, request)
+            return httpx.Response(response.status_code, headers=response.headers.raw,
+                                  stream=RecordingStream(key, response, start), extensions=response.extensions)
+
+        async def handle_async_request(transport, request):
+            key = httpx_key(request)
+            if cassette.mode == "replay":
+                frame = cassette._take(key)
+                await cassette._async_wait(frame["e"])
+                return httpx.Response(frame["s"], headers=frame["h"], stream=AsyncReplayStream(frame))
+            start = time.perf_counter()
+            response = await original_async(transport, request)
+            return httpx.Response(response.status_code, headers=response.headers.raw,
+                                  stream=AsyncRecordingStream(key, response, start), extensions=response.extensions)
+
+        self._patch(httpx.HTTPTransport, "handle_request", handle_request)
+        self._patch(httpx.AsyncHTTPTransport, "handle_async_request", handle_async_request)
+
+    # Lifecycle
+
+    def install(self):
+        if self.mode == "record":
+            self._file = gzip.open(self.path, "wb")
+            self._file.write(MAGIC)
+        else:
+            self._file = gzip.open(self.path, "rb")
+            if self._file.read(len(MAGIC)) != MAGIC:
+                self._file.close()
+                raise ValueError(f"Not a cassette: {self.path}")
+        self._patch_httplib2()
+        self._patch_requests()
+        self._patch_httpx()
+        return self
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches = []
+        with self._lock:
+            self._file.close()
+            self._pending = {}
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+
+def recording(path):
+    return Cassette(path, "record")
+
+
+def replaying(path, timing="original"):
+    return Cassette(path, "replay", timing)
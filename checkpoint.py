@@ -0,0 +1,63 @@
+"""Progress file of a backfill, so an interrupted run resumes where it stopped.
+
+Records, per channel, the videos summarized (with their title) and the ones
+that failed (with the reason and the number of attempts). Failed videos are
+tried again by the next runs, up to ``max_attempts`` times. The file is
+rewritten atomically after every video, a crash never leaves it half written.
+"""
+import json
+import os
+import tempfile
+import threading
+
+
+class Checkpoint:
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="UTF-8") as f:
+                self.channels = json.load(f)["channels"]
+        except FileNotFoundError:
+            self.channels = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _channel(self, channel_id):
+        return self.channels.setdefault(channel_id, {"done": {}, "failed": {}})
+
+    @staticmethod
+    def _attempts(failure):
+        # Failures written before attempts were counted are plain reasons
+        return failure["attempts"] if isinstance(failure, dict) else 1
+
+    def seen(self, channel_id):
+        # IDs not to process again: summarized, or failed max_attempts times
+        with self._lock:
+            channel = self._channel(channel_id)
+            given_up = {
+                video_id for video_id, failure in channel["failed"].items()
+                if self._attempts(failure) >= self.max_attempts
+            }
+            return set(channel["done"]) | given_up
+
+    def done(self, channel_id, video_id, title):
+        with self._lock:
+            channel = self._channel(channel_id)
+            channel["done"][video_id] = title
+            channel["failed"].pop(video_id, None)
+            self._save()
+
+    def failed(self, channel_id, video_id, reason):
+        with self._lock:
+            failed = self._channel(channel_id)["failed"]
+            attempts = self._attempts(failed[video_id]) + 1 if video_id in failed else 1
+            failed[video_id] = {"reason": reason, "attempts": attempts}
+            self._save()
+
+    def _save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="UTF-8") as f:
+            json.dump({"channels": self.channels}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,288 @@
+"""Near-duplicate detection between transcripts, with MinHash and LSH.
+
+Transcripts are cut into blocks of about ``AVERAGE_BLOCK_WORDS`` words at
+content-defined boundaries. A boundary falls where the hash of a word
+shingle matches a pattern. A re-upload, a Short cut from a long video or a
+"part 2" repeating a section therefore produce the same blocks as the
+original around the text they share. Each block gets a MinHash signature
+of its ``SHINGLE_WORDS``-word shingles, computed with NumPy over batches of
+blocks. It is indexed under one LSH key per band of its signature. The keys
+of each band are kept in a sorted array and looked up with ``searchsorted``.
+
+Segments are read once, as an iterable: a transcript spooled to disk is
+hashed as it is read, 16 bytes per word, and never held as text.
+
+``DedupeIndex.query()`` finds the blocks of a transcript that match a
+stored block in at least ``MIN_BAND_VOTES`` bands. It returns the fraction
+of the words they cover, the segments left (the novel ones) and the videos
+matched.
+"""
+import os
+import re
+from array import array
+import threading
+import zlib
+from collections import Counter, namedtuple
+
+import numpy as np
+
+SHINGLE_WORDS = 5
+# Small blocks: the blocks of a Short cut from a video only match once the
+# cut is past the first boundary, the words before it are counted as novel
+AVERAGE_BLOCK_WORDS = 32
+MIN_BLOCK_WORDS = 8
+MAX_BLOCK_WORDS = 128
+NUM_PERM = 64
+BANDS = 16
+# Two blocks match when their keys are equal in this many bands: 0.7% of the
+# blocks sharing 30% of their shingles, 63% at 60%, 99.7% at 80%
+MIN_BAND_VOTES = 2
+# Shingles hashed at once, NUM_PERM x BATCH_SHINGLES x 8 bytes of memory
+BATCH_SHINGLES = 1 << 16
+WORD_PATTERN = re.compile(r"\w+")
+
+# fraction: share of the words of the transcript in known blocks
+# novel_segments: indices of the segments mostly outside known blocks
+# videos: video ID -> matching blocks, best match first
+Overlap = namedtuple("Overlap", ["fraction", "novel_segments", "videos"])
+
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(x):
+    # splitmix64 finalizer, element-wise on uint64 arrays
+    x = x ^ (x >> np.uint64(30))
+    x = x * _MIX1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _MIX2
+    return x ^ (x >> np.uint64(31))
+
+
+def _words(segments):
+    # Hash of every word, index of its segment, and number of segments.
+    # crc32 and not hash(): the index is saved, hashes must be the same in
+    # every process
+    hashes = array("Q")
+    owners = array("q")
+    known = {}
+    count = 0
+    for index, segment in enumerate(segments):
+        count = index + 1
+        for word in WORD_PATTERN.findall(segment["text"].lower()):
+            value = known.get(word)
+            if value is None:
+                value = known[word] = zlib.crc32(word.encode("UTF-8"))
+            hashes.append(value)
+            owners.append(index)
+    return np.frombuffer(hashes, dtype=np.uint64), np.frombuffer(owners, dtype=np.int64), count
+
+
+def _shingles(words):
+    count = len(words) - SHINGLE_WORDS + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        shingles = _mix(shingles ^ words[offset:offset + count])
+    return shingles
+
+
+def _block_starts(shingles):
+    # Blocks start at the shingles whose hash is a multiple of
+    # AVERAGE_BLOCK_WORDS, at least MIN_BLOCK_WORDS and at most
+    # MAX_BLOCK_WORDS apart
+    count = len(shingles)
+    anchors = np.flatnonzero(shingles % np.uint64(AVERAGE_BLOCK_WORDS) == 0)
+    starts = [0]
+    for anchor in anchors.tolist():
+        while anchor - starts[-1] > MAX_BLOCK_WORDS:
+            starts.append(starts[-1] + MAX_BLOCK_WORDS)
+        if anchor - starts[-1] >= MIN_BLOCK_WORDS:
+            starts.append(anchor)
+    while count - starts[-1] > MAX_BLOCK_WORDS:
+        starts.append(starts[-1] + MAX_BLOCK_WORDS)
+    return np.array(starts, dtype=np.int64)
+
+
+class DedupeIndex:
+    def __init__(self, seed=1):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions, one per permutation
+        self._a = rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+        self.video_ids = []
+        self._known = set()
+        # Video number of every stored block
+        self._block_videos = np.empty(0, dtype=np.int32)
+        # Per band, the sorted keys and the block of each key
+        self._keys = [np.empty(0, dtype=np.uint32) for _ in range(BANDS)]
+        self._blocks = [np.empty(0, dtype=np.int32) for _ in range(BANDS)]
+        # Set by add(), cleared by save()
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __contains__(self, video_id):
+        return video_id in self._known
+
+    @property
+    def block_count(self):
+        return len(self._block_videos)
+
+    def _signatures(self, shingles, starts):
+        # MinHash signature of every block, (blocks, NUM_PERM). Whole blocks
+        # are hashed together, up to BATCH_SHINGLES shingles at a time
+        signatures = np.empty((len(starts), NUM_PERM), dtype=np.uint64)
+        ends = np.append(starts[1:], len(shingles))
+        first = 0
+        while first < len(starts):
+            last = max(first + 1, int(np.searchsorted(ends, starts[first] + BATCH_SHINGLES, side="right")))
+            low, high = starts[first], ends[last - 1]
+            hashed = (self._a[:, None] * shingles[None, low:high] + self._b[:, None]) >> np.uint64(32)
+            signatures[first:last] = np.minimum.reduceat(hashed, starts[first:last] - low, axis=1).T
+            first = last
+        return signatures
+
+    def _band_keys(self, signatures):
+        # 32-bit keys: random collisions in a band are too rare to add up to
+        # MIN_BAND_VOTES, and the index takes 8 bytes per block and band
+        rows = signatures.reshape(len(signatures), BANDS, NUM_PERM // BANDS)
+        keys = np.zeros(rows.shape[:2], dtype=np.uint64)
+        for row in range(rows.shape[2]):
+            keys = _mix(keys ^ rows[:, :, row])
+        return (keys >> np.uint64(32)).astype(np.uint32)
+
+    def _analyze(self, segments):
+        words, owners, count = _words(segments)
+        shingles = _shingles(words)
+        starts = _block_starts(shingles) if len(shingles) else np.empty(0, dtype=np.int64)
+        return words, owners, count, shingles, starts
+
+    def add(self, video_id, segments):
+        self.add_many([(video_id, segments)])
+
+    def add_many(self, transcripts):
+        # Transcripts are hashed in batches of BATCH_SHINGLES shingles and
+        # inserted in the index at once
+        keys = []
+        videos = []
+        batch_shingles, batch_starts, batch_videos = [], [], []
+        size = 0
+
+        def flush():
+            if batch_starts:
+                shingles = np.concatenate(batch_shingles)
+                keys.append(self._band_keys(self._signatures(shingles, np.concatenate(batch_starts))))
+                videos.extend(batch_videos)
+                batch_shingles.clear()
+                batch_starts.clear()
+                batch_videos.clear()
+
+        with self._lock:
+            for video_id, segments in transcripts:
+                _, _, _, shingles, starts = self._analyze(segments)
+                number = len(self.video_ids)
+                self.video_ids.append(video_id)
+                self._known.add(video_id)
+                if not len(starts):
+                    continue
+                batch_shingles.append(shingles)
+                batch_starts.append(starts + size)
+                batch_videos.append(np.full(len(starts), number, dtype=np.int32))
+                size += len(shingles)
+                if size >= BATCH_SHINGLES:
+                    flush()
+                    size = 0
+            flush()
+            if keys:
+                self._insert(np.concatenate(keys), np.concatenate(videos))
+            self.dirty = True
+
+    def _insert(self, keys, videos):
+        blocks = np.arange(self.block_count, self.block_count + len(keys), dtype=np.int32)
+        self._block_videos = np.concatenate([self._block_videos, videos])
+        for band in range(BANDS):
+            order = np.argsort(keys[:, band], kind="stable")
+            band_keys = keys[order, band]
+            positions = np.searchsorted(self._keys[band], band_keys)
+            self._keys[band] = np.insert(self._keys[band], positions, band_keys)
+            self._blocks[band] = np.insert(self._blocks[band], positions, blocks[order])
+
+    def query(self, segments, exclude=None):
+        # exclude: video ID whose blocks are ignored, e.g. the video itself
+        # when it is processed again
+        words, owners, segment_count, shingles, starts = self._analyze(segments)
+        if not len(starts):
+            return Overlap(0.0, list(range(segment_count)), {})
+        keys = self._band_keys(self._signatures(shingles, starts))
+        with self._lock:
+            block_count = self.block_count
+            pairs = []
+            for band in range(BANDS):
+                low = np.searchsorted(self._keys[band], keys[:, band], side="left")
+                counts = np.searchsorted(self._keys[band], keys[:, band], side="right") - low
+                total = int(counts.sum())
+                if not total:
+                    continue
+                # Position in the band of every (query block, stored block) pair
+                positions = np.arange(total) - np.repeat(np.cumsum(counts) - counts - low, counts)
+                pairs.append(np.repeat(np.arange(len(starts)), counts) * block_count + self._blocks[band][positions])
+            if not pairs:
+                return Overlap(0.0, list(range(segment_count)), {})
+            pairs, votes = np.unique(np.concatenate(pairs), return_counts=True)
+            matched = pairs[votes >= MIN_BAND_VOTES]
+            matched_videos = self._block_videos[matched % block_count]
+            if exclude in self._known:
+                kept = np.array([self.video_ids[number] != exclude for number in matched_videos.tolist()], dtype=bool)
+                matched, matched_videos = matched[kept], matched_videos[kept]
+            videos = Counter(self.video_ids[number] for number in matched_videos.tolist())
+
+        # Words covered by the shingles of the known blocks
+        ends = np.append(starts[1:], len(shingles)) + SHINGLE_WORDS - 1
+        known = np.zeros(len(words) + 1, dtype=np.int64)
+        known_blocks = np.unique(matched // block_count)
+        np.add.at(known, starts[known_blocks], 1)
+        np.add.at(known, ends[known_blocks], -1)
+        known = np.cumsum(known[:-1]) > 0
+
+        known_words = np.bincount(owners, weights=known, minlength=segment_count)
+        segment_words = np.bincount(owners, minlength=segment_count)
+        novel = np.flatnonzero(known_words * 2 < segment_words)
+        return Overlap(float(known.mean()), novel.tolist(), dict(videos.most_common()))
+
+    def save(self, path):
+        with self._lock:
+            temporary = f"{path}.tmp"
+            with open(temporary, "wb") as f:
+                np.savez(
+                    f,
+                    seed=np.array(self.seed),
+                    video_ids=np.array(self.video_ids, dtype=str),
+                    block_videos=self._block_videos,
+                    keys=np.stack(self._keys),
+                    blocks=np.stack(self._blocks),
+                )
+            os.replace(temporary, path)
+            self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(seed=int(data["seed"]))
+            index.video_ids = data["video_ids"].tolist()
+            index._known = set(index.video_ids)
+            index._block_videos = data["block_videos"]
+            index._keys = list(data["keys"])
+            index._blocks = list(data["blocks"])
+        return index
+
+    @classmethod
+    def from_archive(cls, reader, seed=1):
+        # Index of every transcript of a transcript_archive.ArchiveReader
+        index = cls(seed=seed)
+        index.add_many(reader)
+        return index
@@ -0,0 +1,97 @@
+"""One email per run gathering every summary, instead of one email per video.
+
+Summaries are spooled to a temporary file as the videos are processed, so a
+run with dozens of long summaries does not keep them all in memory.
+``iter_html()`` then renders the digest piece by piece: a table of contents
+followed by one section per video, each read back from the file on its own,
+and the errors of the run.
+"""
+import html
+import re
+import tempfile
+import threading
+from string import Template
+
+# Summaries above this total size are moved from memory to a temporary file
+SPILL_THRESHOLD_BYTES = 1024 * 1024
+
+PAGE_START = Template("""<html>
+<body>
+<h1>$heading</h1>
+""")
+TOC_START = "<h2>Sommaire</h2>\n<ol>\n"
+TOC_ENTRY = Template('<li><a href="#$anchor">$title</a></li>\n')
+TOC_END = "</ol>\n"
+SECTION_START = Template("""<hr>
+<div id="$anchor">
+<h1>$title</h1>
+<p><a href="https://www.youtube.com/watch?v=$video_id">Voir la vidéo</a></p>
+""")
+SECTION_END = "\n</div>\n"
+ERRORS_START = "<hr>\n<h2>Erreurs</h2>\n<ul>\n"
+ERROR_ENTRY = Template("<li>$message</li>\n")
+ERRORS_END = "</ul>\n"
+PAGE_END = "</body>\n</html>\n"
+
+BODY_PATTERN = re.compile(r"<body[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+DOCUMENT_TAGS_PATTERN = re.compile(r"</?(?:html|body)[^>]*>|<head>.*?</head>", re.IGNORECASE | re.DOTALL)
+
+
+def summary_fragment(summary):
+    # The model answers with a whole HTML document, only its body is kept
+    match = BODY_PATTERN.search(summary)
+    fragment = match.group(1) if match else summary
+    return DOCUMENT_TAGS_PATTERN.sub("", fragment).strip()
+
+
+class Digest:
+    def __init__(self, spill_threshold=SPILL_THRESHOLD_BYTES):
+        self._file = tempfile.SpooledTemporaryFile(max_size=spill_threshold, mode="w+b", prefix="digest-")
+        # (video_id, title, offset, size) of each summary in the file
+        self.entries = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add(self, video_id, title, summary):
+        data = summary_fragment(summary).encode("UTF-8")
+        with self._lock:
+            self._file.seek(0, 2)
+            self.entries.append((video_id, title, self._file.tell(), len(data)))
+            self._file.write(data)
+
+    def add_error(self, message):
+        with self._lock:
+            self.errors.append(message)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def iter_html(self, heading):
+        yield PAGE_START.substitute(heading=html.escape(heading))
+        if self.entries:
+            yield TOC_START
+            for index, (video_id, title, _, _) in enumerate(self.entries):
+                yield TOC_ENTRY.substitute(anchor=f"video-{index}", title=html.escape(title))
+            yield TOC_END
+        for index, (video_id, title, offset, size) in enumerate(self.entries):
+            yield SECTION_START.substitute(anchor=f"video-{index}", title=html.escape(title), video_id=video_id)
+            with self._lock:
+                self._file.seek(offset)
+                data = self._file.read(size)
+            yield data.decode("UTF-8")
+            yield SECTION_END
+        if self.errors:
+            yield ERRORS_START
+            for message in self.errors:
+                yield ERROR_ENTRY.substitute(message=html.escape(message))
+            yield ERRORS_END
+        yield PAGE_END
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,85 @@
+"""Incremental clean-up of an HTML summary streamed by the model.
+
+The model wraps its answer in a ```html ... ``` code fence and sometimes
+keeps writing after the document. ``FenceStripper`` removes the fences from
+the chunks as they arrive and reports when the closing ``</html>`` tag has
+been emitted, so the caller can stop reading the stream there.
+"""
+
+FENCE = "```"
+LANGUAGE = "html"
+CLOSING_TAG = "</html>"
+
+
+class _Remover:
+    # Removes every occurrence of one pattern from a stream, as str.replace
+    # would on the whole text: the end of a chunk that may be the start of
+    # the pattern is held back until the next chunk decides
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._pending = ""
+
+    def feed(self, chunk):
+        data = self._pending + chunk
+        out = []
+        position = 0
+        while True:
+            found = data.find(self.pattern, position)
+            if found == -1:
+                break
+            out.append(data[position:found])
+            position = found + len(self.pattern)
+        keep = next(
+            (n for n in range(min(len(self.pattern) - 1, len(data) - position), 0, -1)
+             if data.endswith(self.pattern[:n])),
+            0,
+        )
+        out.append(data[position:len(data) - keep])
+        self._pending = data[len(data) - keep:]
+        return "".join(out)
+
+    def close(self):
+        pending, self._pending = self._pending, ""
+        return pending
+
+
+class FenceStripper:
+    # Same output as text.replace("```html", "").replace("```", "") on the
+    # whole text (and dropping what follows </html>), but chunk by chunk.
+    # Both replacements are chained in that order, so runs of four or more
+    # backticks come out as they would from the two passes
+
+    def __init__(self):
+        self.done = False
+        self._language_fence = _Remover(FENCE + LANGUAGE)
+        self._fence = _Remover(FENCE)
+        # Last characters emitted, to find a closing tag split across chunks
+        self._tail = ""
+        self._parts = []
+
+    def feed(self, chunk):
+        # Returns the part of the text that can be emitted so far
+        if self.done:
+            return ""
+        return self._emit(self._fence.feed(self._language_fence.feed(chunk)))
+
+    def close(self):
+        # End of the stream, flushes what was held back
+        if self.done:
+            return ""
+        text = self._fence.feed(self._language_fence.close()) + self._fence.close()
+        return self._emit(text)
+
+    def text(self):
+        return "".join(self._parts)
+
+    def _emit(self, text):
+        window = self._tail + text
+        end = window.lower().find(CLOSING_TAG)
+        if end != -1:
+            self.done = True
+            text = text[:end + len(CLOSING_TAG) - len(self._tail)]
+        self._tail = window[-(len(CLOSING_TAG) - 1):]
+        self._parts.append(text)
+        return text
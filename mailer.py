@@ -0,0 +1,207 @@
+"""SMTP delivery over one authenticated connection per invocation.
+
+Messages are queued and sent in a batch by ``flush()``, reusing the same
+connection (one TCP + STARTTLS + login handshake for the whole run). A
+connection dropped by the server is reopened and the message retried.
+Large HTML bodies can be queued with ``queue_stream()``: they are rendered
+and written to the connection chunk by chunk while being sent.
+"""
+import base64
+import logging
+import smtplib
+import threading
+from email.header import Header
+from email.mime.text import MIMEText
+from email.utils import COMMASPACE
+
+# Errors after which the connection is reopened and the message sent again
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+# Bytes of body encoded per base64 line (76 characters)
+BASE64_LINE_BYTES = 57
+
+
+class StreamedMessage:
+    # HTML message whose body is never held in memory as a whole. render()
+    # returns a new iterator of str chunks, called again if the message has
+    # to be resent on a new connection
+
+    def __init__(self, subject, render, sender, recipients):
+        self.subject = subject
+        self.render = render
+        # Long subjects are folded: with CRLF, a bare LF in DATA is rejected
+        # by strict servers
+        encoded_subject = Header(subject, 'utf-8').encode(linesep="\r\n")
+        self.headers = (
+            f"Subject: {encoded_subject}\r\n"
+            f"From: {sender}\r\n"
+            f"To: {COMMASPACE.join(recipients)}\r\n"
+            "MIME-Version: 1.0\r\n"
+            'Content-Type: text/html; charset="utf-8"\r\n'
+            "Content-Transfer-Encoding: base64\r\n"
+            "\r\n"
+        ).encode("ascii")
+
+    def __getitem__(self, key):
+        # Same access as email.message.Message, for the logs
+        return self.subject if key == 'Subject' else None
+
+    def iter_data(self):
+        # Base64 lines never start with a dot: no dot-stuffing is needed
+        yield self.headers
+        pending = b""
+        for chunk in self.render():
+            pending += chunk.encode("UTF-8")
+            cut = len(pending) - len(pending) % BASE64_LINE_BYTES
+            if cut:
+                yield base64.encodebytes(pending[:cut]).replace(b"\n", b"\r\n")
+                pending = pending[cut:]
+        yield base64.encodebytes(pending).replace(b"\n", b"\r\n")
+
+
+class Mailer:
+    def __init__(self, host, port, sender, password, recipients, starttls=True, timeout=30, max_attempts=3):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.recipients = recipients
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.bytes_sent = 0
+        self.connections = 0
+        self.reconnects = 0
+        self._connection = None
+        self._queue = []
+        # smtplib connections are not thread-safe, channels queue concurrently
+        self._lock = threading.Lock()
+
+    def queue(self, subject, body):
+        msg = MIMEText(body, 'html')
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = COMMASPACE.join(self.recipients)
+        with self._lock:
+            self._queue.append(msg)
+
+    def queue_stream(self, subject, render):
+        # render() must stay usable until flush() returns
+        with self._lock:
+            self._queue.append(StreamedMessage(subject, render, self.sender, self.recipients))
+
+    def flush(self):
+        # Sends every queued message, returns how many were sent. Raises once
+        # all of them were attempted if some could not be delivered
+        with self._lock:
+            messages, self._queue = self._queue, []
+            failures = []
+            for number, msg in enumerate(messages):
+                try:
+                    self._send(msg)
+                except smtplib.SMTPAuthenticationError as e:
+                    # Logging in again for every message would fail the same way
+                    logging.error(f"SMTP login failed, {len(messages) - number} email(s) not sent: {e}")
+                    failures += [remaining['Subject'] for remaining in messages[number:]]
+                    break
+                except Exception as e:
+                    logging.error(f"Failed to send email '{msg['Subject']}': {e}")
+                    failures.append(msg['Subject'])
+        if failures:
+            raise smtplib.SMTPException(f"{len(failures)} email(s) could not be sent: {', '.join(failures)}")
+        return len(messages)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            connection.login(self.sender, self.password)
+        except BaseException:
+            connection.close()
+            raise
+        self.connections += 1
+        return connection
+
+    def _disconnect(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                self._connection.close()
+            self._connection = None
+
+    def _reset(self):
+        # Drops the connection without QUIT, which would be read as message
+        # data in the middle of DATA. The next message opens a new one
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _send(self, msg):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if self._connection is None:
+                    self._connection = self._connect()
+                if isinstance(msg, StreamedMessage):
+                    size = self._send_streamed(msg)
+                else:
+                    data = msg.as_string()
+                    self._connection.sendmail(self.sender, self.recipients, data)
+                    size = len(data)
+                self.sent += 1
+                self.bytes_sent += size
+                return
+            except RECONNECT_ERRORS as e:
+                self._reset()
+                if attempt == self.max_attempts:
+                    raise
+                self.reconnects += 1
+                logging.warning(f"SMTP connection lost ({e}), reconnecting ({attempt}/{self.max_attempts})")
+
+    def _send_streamed(self, msg):
+        # sendmail() needs the whole message, the DATA command is driven here
+        connection = self._connection
+        code, response = connection.mail(self.sender)
+        if code != 250:
+            connection.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.sender)
+        for recipient in self.recipients:
+            code, response = connection.rcpt(recipient)
+            if code not in (250, 251):
+                connection.rset()
+                raise smtplib.SMTPRecipientsRefused({recipient: (code, response)})
+        code, response = connection.docmd("data")
+        if code != 354:
+            connection.rset()
+            raise smtplib.SMTPDataError(code, response)
+        try:
+            size = 0
+            for data in msg.iter_data():
+                connection.send(data)
+                size += len(data)
+            connection.send(b".\r\n")
+            code, response = connection.getreply()
+        except BaseException:
+            # Whatever failed (render() included), the server is still in
+            # DATA: the next message must not be written into this body
+            self._reset()
+            raise
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        return size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self.flush()
+        finally:
+            self.close()
@@ -0,0 +1 @@
+../state_store.py
\ No newline at end of file
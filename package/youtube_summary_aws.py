@@ -54,48 +54,57 @@ def check_new_video():
 
     return video_id, video_title
 
+# Processed video IDs, one item per channel: {channel_id, processed_ids, version}
+STATE_TABLE = os.getenv("STATE_TABLE", "YouTubeSummaryState")
+_state_store = None
+
+def get_state_store():
+    global _state_store
+    if _state_store is None:
+        from state_store import DynamoDBStateStore
+        _state_store = DynamoDBStateStore(STATE_TABLE, region_name="eu-central-1")
+    return _state_store
+
 def is_new_video(video_id):
-    video_id_file = '/home/rhodes/Desktop/YoutubeSummary/last_video_id.json'
-    
-    # Check if the file exists and has valid content
-    if os.path.exists(video_id_file):
-        try:
-            with open(video_id_file, 'r') as file:
-                last_video = json.load(file)
-                # If the last video ID matches, return False (no new video)
-                if last_video.get('video_id') == video_id:
-                    return False
-        except (json.JSONDecodeError, ValueError):
-            print("Error reading JSON. The file might be corrupted or empty.")
-    else:
-        print(f"No previous video ID found, creating new file: {video_id_file}")
-
-    # If no valid last video ID is found, save the current video ID and return True
-    with open(video_id_file, 'w') as file:
-        json.dump({'video_id': video_id}, file)
-    
-    return True
+    # Claimed with a compare-and-swap on the version of the item: False when
+    # a previous run, or an overlapping one, already processed the video
+    return bool(get_state_store().claim(CHANNEL_ID, [video_id]))
 
 def get_transcript(video_id):
-    transcript = YouTubeTranscriptApi.get_transcript(video_id)
-    full_text = ' '.join([item['text'] for item in transcript])
-    
-    # Save the transcript to a text file
-    with open('transcript.txt', 'w') as file:
-        file.write(full_text)
-    
-    return full_text
+    # youtube-transcript-api 1.x: fetch() on an instance replaces the
+    # get_transcript() class method
+    transcript = YouTubeTranscriptApi().fetch(video_id).to_raw_data()
+    return ' '.join([item['text'] for item in transcript])
+
+# S3 archive of the transcripts (gzip) and summaries, off when ARCHIVE_BUCKET
+# is empty. ARCHIVE_ENDPOINT_URL points it at an S3-compatible server
+ARCHIVE_BUCKET = os.getenv("ARCHIVE_BUCKET", "")
+ARCHIVE_PREFIX = os.getenv("ARCHIVE_PREFIX", "youtube-summary/")
+ARCHIVE_ENDPOINT_URL = os.getenv("ARCHIVE_ENDPOINT_URL") or None
+ARCHIVE_MAX_CONCURRENCY = int(os.getenv("ARCHIVE_MAX_CONCURRENCY", "10"))
+
+def new_archive():
+    if not ARCHIVE_BUCKET:
+        return None
+    from botocore.config import Config
+    from s3_archive import S3Archive
+    client = boto3.client(
+        's3',
+        region_name="eu-central-1",
+        endpoint_url=ARCHIVE_ENDPOINT_URL,
+        config=Config(max_pool_connections=ARCHIVE_MAX_CONCURRENCY)
+    )
+    return S3Archive(ARCHIVE_BUCKET, ARCHIVE_PREFIX, client=client, max_concurrency=ARCHIVE_MAX_CONCURRENCY)
 
-def summarize_with_gpt(file_path):
-    # Read the transcript from the file
-    with open(file_path, 'r') as file:
-        transcript = file.read()
+def close_archive(archive):
+    # Waits for the uploads still running, a failed one doesn't fail the run
+    uploaded, failed = archive.close()
+    print(f"Archived {len(uploaded)} object(s) in s3://{ARCHIVE_BUCKET}/{ARCHIVE_PREFIX}")
+    for key, error in failed:
+        print(f"Failed to archive {key}: {error}")
 
 # Use GPT to summarize the transcript with the new OpenAI client
-def summarize_with_gpt(file_path):
-    with open(file_path, 'r') as file:
-        transcript = file.read()
-
+def summarize_with_gpt(transcript):
     chat_completion = client.chat.completions.create(
         messages=[
             {
@@ -137,24 +146,35 @@ def send_email(subject, body):
         server.sendmail(SENDER_EMAIL, RECIPIENT_EMAILS, msg.as_string())
 
 if __name__ == "__main__":
-    video_id, video_title = check_new_video()
-    
-    # Check if the video is new
-    if is_new_video(video_id):
-        print(f"New video detected: {video_title}")
-        
-        transcript = get_transcript(video_id)
-        
-        # Summarize the transcript with HTML formatting and in French, without markdown
-        summary = summarize_with_gpt('transcript.txt')   
-        
-        # Send the formatted summary as an HTML email
-        send_email(f"Résumé de la dernière vidéo: {video_title}", summary)
-        
-        print("Email sent successfully!")
-    else:
-        print("No new video detected.")
-        # Send email notifying no new video
-        send_email("Pas de nouvelle vidéo", "Il n'y a pas de nouvelle vidéo pour aujourd'hui.")
-        print("No new video email sent.")
+    # Uploads run in the background while the video is summarized and
+    # emailed, the run only waits for them at the end
+    archive = new_archive()
+    try:
+        video_id, video_title = check_new_video()
+
+        # Check if the video is new
+        if is_new_video(video_id):
+            print(f"New video detected: {video_title}")
+
+            transcript = get_transcript(video_id)
+            if archive is not None:
+                archive.archive_transcript(video_id, transcript)
+
+            # Summarize the transcript with HTML formatting and in French, without markdown
+            summary = summarize_with_gpt(transcript)
+            if archive is not None:
+                archive.archive_summary(video_id, summary)
+
+            # Send the formatted summary as an HTML email
+            send_email(f"Résumé de la dernière vidéo: {video_title}", summary)
+
+            print("Email sent successfully!")
+        else:
+            print("No new video detected.")
+            # Send email notifying no new video
+            send_email("Pas de nouvelle vidéo", "Il n'y a pas de nouvelle vidéo pour aujourd'hui.")
+            print("No new video email sent.")
+    finally:
+        if archive is not None:
+            close_archive(archive)
 
@@ -0,0 +1,169 @@
+"""Pool of proxy endpoints scored by latency and error rate.
+
+Each endpoint keeps an exponentially weighted moving average (EWMA) of its
+latency and of its error rate, and a limit on concurrent requests.
+``acquire()`` hands out the best scored endpoint that has a free slot. An
+endpoint whose error rate goes above ``error_threshold`` (a rate-limited exit
+IP, typically) is put in cooldown and only used again once every other
+endpoint is busy or failing too.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Latency assumed for an endpoint that was never used, in seconds
+DEFAULT_LATENCY = 1.0
+# Retries of failed connections and 5xx answers, inside a single request.
+# 429 is not retried here: it means the exit IP is blocked, the caller moves
+# to another endpoint instead
+HTTP_RETRIES = int(os.getenv("TRANSCRIPT_HTTP_RETRIES", "2"))
+
+
+def new_adapter(max_concurrency):
+    # Keep-alive connection pool sized for the concurrent requests of one
+    # endpoint. urllib3 pools are thread-safe, one adapter is shared by every
+    # session of the endpoint
+    return HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=max(10, 2 * max_concurrency),
+        max_retries=Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["GET", "POST"],
+            raise_on_status=False,
+        ),
+    )
+
+
+def new_session(adapter, url):
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.proxies = {"http": url, "https": url}
+    return session
+
+
+class ProxyEndpoint:
+    def __init__(self, url, max_concurrency):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        # Kept alive for the lifetime of the pool, so requests through this
+        # proxy reuse its connections and TLS sessions
+        self.adapter = new_adapter(max_concurrency)
+        self.session = new_session(self.adapter, url)
+        self._config = None
+        self._local = threading.local()
+
+    @property
+    def config(self):
+        # youtube-transcript-api configuration for this endpoint
+        if self._config is None:
+            from youtube_transcript_api.proxies import GenericProxyConfig
+            self._config = GenericProxyConfig(http_url=self.url, https_url=self.url)
+        return self._config
+
+    @property
+    def transcript_api(self):
+        # One YouTubeTranscriptApi per endpoint and per thread, reused for
+        # every video that thread fetches: the class is not thread-safe, and
+        # its fetcher sets the consent cookie in the cookie jar of its
+        # session. Every session shares the connections of the endpoint
+        # adapter and the hooks of self.session
+        transcript_api = getattr(self._local, "transcript_api", None)
+        if transcript_api is None:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            session = new_session(self.adapter, self.url)
+            session.hooks = self.session.hooks
+            transcript_api = YouTubeTranscriptApi(proxy_config=self.config, http_client=session)
+            self._local.transcript_api = transcript_api
+        return transcript_api
+
+    @property
+    def host(self):
+        # For logs: the URL without the credentials
+        return self.url.rsplit("@", 1)[-1]
+
+    def score(self):
+        # Lower is better, errors weigh much more than latency
+        latency = DEFAULT_LATENCY if self.latency is None else self.latency
+        return latency * (1 + 10 * self.error_rate)
+
+
+class ProxyPool:
+    def __init__(self, urls, max_concurrency=2, alpha=0.3, error_threshold=0.5, cooldown=60):
+        self.endpoints = [ProxyEndpoint(url, max_concurrency) for url in urls]
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self._condition = threading.Condition()
+
+    def healthy_endpoints(self):
+        now = time.monotonic()
+        with self._condition:
+            return [endpoint for endpoint in self.endpoints if endpoint.cooldown_until <= now]
+
+    def has_healthy(self):
+        return bool(self.healthy_endpoints())
+
+    def _pick(self, exclude):
+        now = time.monotonic()
+        free = [e for e in self.endpoints if e not in exclude and e.in_flight < e.max_concurrency]
+        healthy = [e for e in free if e.cooldown_until <= now]
+        candidates = healthy or free
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (e.score(), e.in_flight))
+
+    @contextmanager
+    def acquire(self, exclude=()):
+        # Waits for a free slot if every endpoint is at its concurrency limit
+        with self._condition:
+            if all(endpoint in exclude for endpoint in self.endpoints):
+                raise RuntimeError("No proxy endpoint left to try")
+            endpoint = self._pick(exclude)
+            while endpoint is None:
+                self._condition.wait()
+                endpoint = self._pick(exclude)
+            endpoint.in_flight += 1
+        try:
+            yield endpoint
+        finally:
+            with self._condition:
+                endpoint.in_flight -= 1
+                # Waiters may exclude different endpoints, wake them all
+                self._condition.notify_all()
+
+    def record(self, endpoint, latency, ok):
+        with self._condition:
+            if ok:
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += self.alpha * (latency - endpoint.latency)
+            endpoint.error_rate += self.alpha * ((0.0 if ok else 1.0) - endpoint.error_rate)
+            if ok:
+                endpoint.cooldown_until = 0.0
+            elif endpoint.error_rate >= self.error_threshold:
+                endpoint.cooldown_until = time.monotonic() + self.cooldown
+
+    def stats(self):
+        with self._condition:
+            return [
+                {
+                    "proxy": endpoint.host,
+                    "latency": endpoint.latency,
+                    "error_rate": round(endpoint.error_rate, 3),
+                    "cooling_down": endpoint.cooldown_until > time.monotonic(),
+                }
+                for endpoint in self.endpoints
+            ]
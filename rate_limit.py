@@ -0,0 +1,201 @@
+"""Client-side limits on the OpenAI request and token rates.
+
+OpenAI enforces requests per minute (RPM) and tokens per minute (TPM) per
+organization and refills both continuously. ``RateLimiter`` mirrors them with
+two token buckets, after botocore's ``TokenBucket``. A call reserves its
+estimated tokens before it is sent and waits for its turn instead of
+collecting 429s. The estimate is corrected once the real usage is known.
+
+When 429s come back anyway (limits not configured, or shared with other
+clients), the request rate adapts like botocore's ``ClientRateLimiter``. It
+drops to 70% of the measured rate, then grows back along a CUBIC curve.
+``backoff_delay()`` gives the jittered exponential delays between retries.
+"""
+import math
+import random
+import threading
+import time
+
+WINDOW = 60.0
+# Limits are also enforced over shorter periods than the minute: the buckets
+# hold what they refill in this many seconds, not a whole minute of calls
+BURST_SECONDS = 1.0
+
+# Jittered exponential backoff between retries, in seconds
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 20.0
+# Lowest request rate the adaptive limiter slows down to, in requests/s
+MIN_ADAPTIVE_RATE = 0.5
+
+
+class TokenBucket:
+    # Holds up to `capacity` tokens and refills at `rate` tokens/s. Starts full
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+        self._condition = threading.Condition()
+
+    def set_rate(self, rate, capacity):
+        with self._condition:
+            # Tokens accumulated so far count at the old rate
+            self._refill()
+            self.rate = rate
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+            self._condition.notify_all()
+
+    def acquire(self, amount, block=True):
+        # Takes `amount` tokens, waiting for them if `block`, and returns whether
+        # they were taken. An amount above the capacity is taken once the
+        # bucket is full, and leaves it in debt
+        with self._condition:
+            self._refill()
+            needed = min(amount, self.capacity)
+            while self.tokens < needed:
+                if not block:
+                    return False
+                self._condition.wait((needed - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+            return True
+
+    def refund(self, amount):
+        # Gives back unused tokens, or takes more if `amount` is negative
+        with self._condition:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+            self._condition.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class RateClocker:
+    # Smoothed rate of the responses received, in responses/s, updated every
+    # half second
+    SMOOTHING = 0.8
+    BUCKET = 0.5
+
+    def __init__(self):
+        self.rate = 0.0
+        self._count = 0
+        self._last_bucket = math.floor(time.monotonic())
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            bucket = math.floor(time.monotonic() / self.BUCKET) * self.BUCKET
+            self._count += 1
+            if bucket > self._last_bucket:
+                current = self._count / (bucket - self._last_bucket)
+                self.rate = self.SMOOTHING * current + (1 - self.SMOOTHING) * self.rate
+                self._count = 0
+                self._last_bucket = bucket
+            return self.rate
+
+
+class CubicRate:
+    # Request rate after a throttle, as in TCP CUBIC: cut to BETA times the
+    # rate at the throttle, then growing back along a cubic curve that
+    # flattens around that rate before probing above it
+    SCALE = 0.4
+    BETA = 0.7
+
+    def __init__(self, max_rate, now):
+        self.max_rate = max_rate
+        self.last_throttle = now
+        self.k = self._zero_point()
+
+    def _zero_point(self):
+        # Seconds after the throttle at which max_rate is reached again
+        return (self.max_rate * (1 - self.BETA) / self.SCALE) ** (1 / 3)
+
+    def success(self, now):
+        return self.SCALE * (now - self.last_throttle - self.k) ** 3 + self.max_rate
+
+    def throttled(self, rate, now):
+        self.max_rate = rate
+        self.last_throttle = now
+        self.k = self._zero_point()
+        return rate * self.BETA
+
+
+class RateLimiter:
+    # rpm / tpm of 0 disable the corresponding limit
+
+    # The adaptive rate never goes above twice the measured one
+    MAX_RATE_ADJUST_SCALE = 2.0
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        # Seconds spent waiting in acquire(), by all threads
+        self.waited = 0.0
+        # 429s reported to record_response()
+        self.throttled = 0
+        self._requests = TokenBucket(rpm / WINDOW, max(1.0, rpm / WINDOW * BURST_SECONDS)) if rpm else None
+        self._tokens = TokenBucket(tpm / WINDOW, tpm / WINDOW * BURST_SECONDS) if tpm else None
+        # Adaptive request rate, off until the first 429
+        self._adaptive = None
+        self._cubic = None
+        self._clocker = RateClocker()
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self):
+        # False while acquire() can never wait
+        return bool(self._requests or self._tokens or self._adaptive)
+
+    def acquire(self, tokens):
+        # Blocks until a call of `tokens` estimated tokens fits in every limit
+        start = time.monotonic()
+        adaptive = self._adaptive
+        if adaptive is not None:
+            adaptive.acquire(1)
+        if self._requests is not None:
+            self._requests.acquire(1)
+        if self._tokens is not None:
+            self._tokens.acquire(tokens)
+        with self._lock:
+            self.waited += time.monotonic() - start
+
+    def settle(self, reserved, used):
+        # Corrects the reservation of acquire() with the real usage of the call,
+        # 0 for a call that failed before the model ran
+        if self._tokens is not None:
+            self._tokens.refund(reserved - used)
+
+    def record_response(self, throttled):
+        measured = self._clocker.record()
+        now = time.monotonic()
+        with self._lock:
+            if not throttled:
+                if self._adaptive is None:
+                    return
+                rate = self._cubic.success(now)
+            else:
+                self.throttled += 1
+                current = measured if self._adaptive is None else min(measured, self._adaptive.rate)
+                if self._cubic is None:
+                    self._cubic = CubicRate(current, now)
+                rate = self._cubic.throttled(current, now)
+            rate = max(MIN_ADAPTIVE_RATE, min(rate, self.MAX_RATE_ADJUST_SCALE * measured))
+            if self._adaptive is None:
+                self._adaptive = TokenBucket(rate, max(1.0, rate))
+            else:
+                self._adaptive.set_rate(rate, max(1.0, rate))
+
+
+def backoff_delay(attempt, retry_after=None, base=BACKOFF_BASE, max_backoff=MAX_BACKOFF):
+    # Full jitter, as botocore's ExponentialBackoff: rand(0, 1) * min(base *
+    # 2 ** attempt, max_backoff), attempt being 0 for the first retry. The
+    # Retry-After sent by the server is a floor
+    delay = random.random() * min(base * 2 ** attempt, max_backoff)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_backoff))
+    return delay
@@ -0,0 +1,151 @@
+"""Where the IDs of the videos already processed are kept, per channel.
+
+Every backend stores one small JSON document per channel together with a
+version, and only supports replacing it through compare-and-swap: two
+overlapping invocations can never both claim the same video. SQLite and
+Cloud Storage back the GCP function, DynamoDB the AWS variant.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+
+# Number of processed video IDs remembered per channel
+HISTORY_SIZE = int(os.getenv("PROCESSED_HISTORY_SIZE", "200"))
+
+
+class StateStore:
+    # Returns (processed_ids, version), newest ID first. version is opaque,
+    # it is only handed back to compare_and_swap
+    def load(self, channel_id):
+        raise NotImplementedError
+
+    # Replaces the processed IDs if the stored version is still `version`,
+    # returns False when another invocation wrote in between
+    def compare_and_swap(self, channel_id, version, processed_ids):
+        raise NotImplementedError
+
+    def claim(self, channel_id, video_ids, retries=10):
+        # Atomically marks video_ids as processed and returns the ones this
+        # invocation claimed, i.e. those nobody had processed yet
+        for attempt in range(retries):
+            processed_ids, version = self.load(channel_id)
+            processed = set(processed_ids)
+            claimed = [video_id for video_id in video_ids if video_id not in processed]
+            if not claimed:
+                return []
+            history = list(reversed(claimed)) + processed_ids
+            if self.compare_and_swap(channel_id, version, history[:HISTORY_SIZE]):
+                return claimed
+            logging.info(f"[{channel_id}] State changed concurrently, retrying ({attempt + 1}/{retries})")
+            time.sleep(0.05 * (attempt + 1))
+        raise RuntimeError(f"Could not update the state of channel {channel_id} after {retries} attempts")
+
+
+class SQLiteStateStore(StateStore):
+    # Local file, for development and single-instance deployments
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS channel_state ("
+                "channel_id TEXT PRIMARY KEY, processed_ids TEXT NOT NULL, version INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per call, connections are not shared between threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, channel_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT processed_ids, version FROM channel_state WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        if row is None:
+            return [], 0
+        return json.loads(row[0]), row[1]
+
+    def compare_and_swap(self, channel_id, version, processed_ids):
+        data = json.dumps(processed_ids)
+        with self._connect() as conn:
+            if version == 0:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO channel_state (channel_id, processed_ids, version) VALUES (?, ?, 1)",
+                    (channel_id, data),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE channel_state SET processed_ids = ?, version = version + 1 "
+                    "WHERE channel_id = ? AND version = ?",
+                    (data, channel_id, version),
+                )
+            return cursor.rowcount == 1
+
+
+class GCSStateStore(StateStore):
+    # One object per channel, the object generation is the version and writes
+    # use it as a precondition (generation 0 means "must not exist yet")
+
+    def __init__(self, bucket_name, prefix="state/", client=None):
+        if client is None:
+            from google.cloud import storage
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.prefix = prefix
+
+    def _blob(self, channel_id):
+        return self.bucket.blob(f"{self.prefix}{channel_id}.json")
+
+    def load(self, channel_id):
+        from google.api_core.exceptions import NotFound
+        blob = self._blob(channel_id)
+        try:
+            data = blob.download_as_bytes()
+        except NotFound:
+            return [], 0
+        return json.loads(data)["processed_ids"], blob.generation
+
+    def compare_and_swap(self, channel_id, version, processed_ids):
+        from google.api_core.exceptions import PreconditionFailed
+        try:
+            self._blob(channel_id).upload_from_string(
+                json.dumps({"processed_ids": processed_ids}),
+                content_type="application/json",
+                if_generation_match=version,
+            )
+            return True
+        except PreconditionFailed:
+            return False
+
+
+class DynamoDBStateStore(StateStore):
+    # One item per channel, {channel_id, processed_ids, version}. Writes are
+    # conditional on the version read, or on the item not existing yet
+
+    def __init__(self, table_name, region_name="eu-central-1", resource=None):
+        if resource is None:
+            import boto3
+            resource = boto3.resource("dynamodb", region_name=region_name)
+        self.table = resource.Table(table_name)
+
+    def load(self, channel_id):
+        item = self.table.get_item(Key={"channel_id": channel_id}, ConsistentRead=True).get("Item", {})
+        # Numbers come back as Decimal
+        return list(item.get("processed_ids", [])), int(item.get("version", 0))
+
+    def compare_and_swap(self, channel_id, version, processed_ids):
+        from boto3.dynamodb.conditions import Attr
+        from botocore.exceptions import ClientError
+        condition = Attr("version").not_exists() if version == 0 else Attr("version").eq(version)
+        try:
+            self.table.put_item(
+                Item={"channel_id": channel_id, "processed_ids": processed_ids, "version": version + 1},
+                ConditionExpression=condition,
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
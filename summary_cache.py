@@ -0,0 +1,145 @@
+"""Persistent cache of HTML summaries, keyed by transcript content, model and prompt version.
+
+A video summarized again (a retried run, a re-send, a reprocessed channel)
+then costs no GPT call. Both backends evict the least recently used entries
+once their total size goes above ``max_bytes``.
+"""
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+
+def cache_key(transcript_sha256, model, prompt_version):
+    return f"{model}-v{prompt_version}-{transcript_sha256}"
+
+
+class SummaryCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        try:
+            summary = self._get(key)
+        except Exception as e:
+            logging.warning(f"Summary cache read failed for {key}: {e}")
+            summary = None
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return summary
+
+    def put(self, key, summary):
+        # A cache failure must never fail the run
+        try:
+            self._put(key, summary)
+            self._evict()
+        except Exception as e:
+            logging.warning(f"Summary cache write failed for {key}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _put(self, key, summary):
+        raise NotImplementedError
+
+    def _evict(self):
+        raise NotImplementedError
+
+
+class DiskSummaryCache(SummaryCache):
+    # One file per summary, the modification time records the last access
+
+    def __init__(self, directory, max_bytes):
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="UTF-8") as f:
+                summary = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return summary
+
+    def _put(self, key, summary):
+        # Written to a temporary file first, readers never see a partial summary
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="UTF-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, self._path(key))
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".html"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class GCSSummaryCache(SummaryCache):
+    # One object per summary, the custom time records the last access
+
+    def __init__(self, bucket_name, max_bytes, prefix="summaries/", client=None):
+        super().__init__(max_bytes)
+        if client is None:
+            from google.cloud import storage
+            client = storage.Client()
+        self.bucket = client.bucket(bucket_name)
+        self.prefix = prefix
+
+    def _get(self, key):
+        from google.api_core.exceptions import NotFound
+        blob = self.bucket.blob(f"{self.prefix}{key}.html")
+        try:
+            summary = blob.download_as_bytes().decode("UTF-8")
+        except NotFound:
+            return None
+        try:
+            blob.custom_time = datetime.now(timezone.utc)
+            blob.patch()
+        except Exception as e:
+            logging.warning(f"Could not record the access time of {blob.name}: {e}")
+        return summary
+
+    def _put(self, key, summary):
+        blob = self.bucket.blob(f"{self.prefix}{key}.html")
+        blob.custom_time = datetime.now(timezone.utc)
+        blob.upload_from_string(summary, content_type="text/html; charset=utf-8")
+
+    def _evict(self):
+        blobs = list(self.bucket.list_blobs(prefix=self.prefix))
+        total = sum(blob.size or 0 for blob in blobs)
+        if total <= self.max_bytes:
+            return
+        blobs.sort(key=lambda blob: blob.custom_time or blob.updated)
+        for blob in blobs:
+            if total <= self.max_bytes:
+                break
+            blob.delete()
+            total -= blob.size or 0
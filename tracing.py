@@ -0,0 +1,247 @@
+"""Lightweight tracing of a run: one span per stage and per external call.
+
+Spans record their wall time and counters (``bytes``, ``retries``,
+``prompt_tokens``, ``completion_tokens``...). At the end of the run they are
+aggregated by name into a single JSON line in the Cloud Logging structured
+format, and optionally replayed as OpenTelemetry spans.
+
+When no run is active every call is a no-op, so instrumented code can also
+be used outside of ``main`` (backfill, benchmarks).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# Counters summed over every span into the totals of the report
+COUNTERS = ("bytes", "retries", "prompt_tokens", "completion_tokens")
+
+# Open spans, innermost last. A context variable and not a thread local:
+# asyncio tasks share a thread but each one gets its own copy of the context
+_open_spans = ContextVar("open_spans", default=())
+
+
+class Span:
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._start = time.perf_counter()
+
+    def add(self, key, value):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.duration = time.perf_counter() - self._start
+
+
+class _NoopSpan:
+    def add(self, key, value):
+        pass
+
+    def set(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Run:
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, None, {})
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def current(self):
+        open_spans = _open_spans.get()
+        return open_spans[-1] if open_spans else self.root
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = Span(name, self.current().span_id, attributes)
+        token = _open_spans.set(_open_spans.get() + (span,))
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _open_spans.reset(token)
+            span.end()
+            with self._lock:
+                self.spans.append(span)
+
+    def bind(self, func):
+        # For work handed to a thread pool, whose threads don't inherit the
+        # context: its spans become children of the span open when bind() was
+        # called. asyncio.to_thread copies the context by itself
+        parent = self.current()
+
+        def with_parent(*args, **kwargs):
+            _open_spans.set((parent,))
+            return func(*args, **kwargs)
+
+        return _in_context(with_parent)
+
+    def report(self):
+        stages = {}
+        totals = dict.fromkeys(COUNTERS, 0)
+        errors = 0
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "total_s": 0.0, "max_s": 0.0, "errors": 0})
+            stage["count"] += 1
+            stage["total_s"] += span.duration
+            stage["max_s"] = max(stage["max_s"], span.duration)
+            if span.error:
+                stage["errors"] += 1
+                errors += 1
+            for counter in COUNTERS:
+                totals[counter] += span.attributes.get(counter, 0)
+        for stage in stages.values():
+            stage["total_s"] = round(stage["total_s"], 3)
+            stage["max_s"] = round(stage["max_s"], 3)
+        return {
+            "run": self.name,
+            "run_id": self.trace_id,
+            "duration_s": round(self.root.duration or 0.0, 3),
+            "errors": errors,
+            "attributes": self.root.attributes,
+            "totals": totals,
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["total_s"])),
+        }
+
+    def log_entry(self):
+        # https://cloud.google.com/logging/docs/structured-logging
+        report = self.report()
+        entry = {
+            "severity": "WARNING" if report["errors"] else "INFO",
+            "message": f"Run {self.name} finished in {report['duration_s']}s",
+            "logging.googleapis.com/labels": {"run": self.name},
+            **report,
+        }
+        project = os.getenv("GOOGLE_CLOUD_PROJECT")
+        if project:
+            entry["logging.googleapis.com/trace"] = f"projects/{project}/traces/{self.trace_id}"
+        return entry
+
+
+_run = None
+
+
+def start_run(name):
+    global _run
+    _run = Run(name)
+    return _run
+
+
+def end_run(run, tracer_provider=None):
+    # Prints the report line and exports the spans if OpenTelemetry is
+    # enabled (TRACE_EXPORT=otel) or a tracer provider is given
+    global _run
+    if _run is run:
+        _run = None
+    run.root.end()
+    print(json.dumps(run.log_entry(), ensure_ascii=False), file=sys.stdout, flush=True)
+    if tracer_provider is not None or os.getenv("TRACE_EXPORT", "none") == "otel":
+        export_otel(run, tracer_provider)
+
+
+@contextmanager
+def span(name, **attributes):
+    run = _run
+    if run is None:
+        yield NOOP_SPAN
+        return
+    with run.span(name, **attributes) as s:
+        yield s
+
+
+def current_span():
+    run = _run
+    return run.current() if run is not None else NOOP_SPAN
+
+
+def _in_context(func):
+    # Runs every call of func in its own copy of the context of the caller of
+    # bind(), so the context variables of the invocation (not only the open
+    # spans) reach the pool threads. A context can only be entered by one
+    # thread at a time, hence the copy per call
+    context = copy_context()
+
+    def bound(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return bound
+
+
+def bind(func):
+    run = _run
+    return run.bind(func) if run is not None else _in_context(func)
+
+
+def count_response(response, *args, **kwargs):
+    # requests response hook: bytes received and urllib3 retries of the
+    # request, added to the span of the calling thread
+    current = current_span()
+    current.add("bytes", len(response.content))
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and retries.history:
+        current.add("retries", len(retries.history))
+
+
+def export_otel(run, tracer_provider=None):
+    # Replays the recorded spans, with their real timestamps and parents,
+    # through the OpenTelemetry API. Without a provider the global one is used
+    # (configured by the deployment, e.g. with a Cloud Trace exporter)
+    try:
+        from opentelemetry import trace
+        from opentelemetry.trace import Status, StatusCode
+    except ImportError:
+        logging.warning("TRACE_EXPORT=otel but opentelemetry is not installed, spans not exported")
+        return
+    provider = tracer_provider or trace.get_tracer_provider()
+    tracer = provider.get_tracer("youtube_summary")
+
+    def start(span, parent):
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = tracer.start_span(
+            span.name,
+            context=context,
+            start_time=int(span.start * 1e9),
+            attributes={key: value for key, value in span.attributes.items() if value is not None},
+        )
+        if span.error:
+            otel_span.set_status(Status(StatusCode.ERROR, span.error))
+        return otel_span
+
+    with run._lock:
+        spans = {span.span_id: span for span in run.spans}
+    started = {run.root.span_id: start(run.root, None)}
+
+    def ensure_started(span):
+        # Parents are started first, whatever the order spans ended in
+        if span.span_id not in started:
+            parent = spans.get(span.parent_id, run.root)
+            started[span.span_id] = start(span, ensure_started(parent))
+        return started[span.span_id]
+
+    for span in spans.values():
+        ensure_started(span)
+    for span in [run.root] + list(spans.values()):
+        started[span.span_id].end(end_time=int((span.start + (span.duration or 0.0)) * 1e9))
@@ -0,0 +1,264 @@
+"""Append-only archive of transcripts, one file per channel.
+
+The data file holds one record per video: the segments of
+``fetched.to_raw_data()`` as JSON lines, zlib-compressed, behind a header
+with the video ID, the payload length and its CRC32. A video archived again
+gets a new record. A sidecar index (``<path>.idx``) holds fixed-size
+``(video_id, offset)`` entries; readers map it with mmap, and the latest
+entry of a video wins.
+
+``ArchiveReader.segments()`` decompresses a single record piece by piece and
+yields its segments as they come, so neither the archive nor a whole
+transcript is ever loaded at once. Iterating a reader goes through the
+videos in file order, for bulk reprocessing. A reader rebuilds a missing
+index from the data file. One writer at a time. Opening the archive for
+writing cuts off what an interrupted append left behind, so new records
+never follow a torn one.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+DATA_MAGIC = b"YTA1"
+INDEX_MAGIC = b"YTI1"
+INDEX_SUFFIX = ".idx"
+# Video ID length, payload length, CRC32 of the payload
+RECORD_HEADER = struct.Struct("<HII")
+# Video ID padded with NUL bytes, offset of the record in the data file
+KEY_SIZE = 16
+INDEX_ENTRY = struct.Struct(f"<{KEY_SIZE}sQ")
+COMPRESS_LEVEL = 6
+# Compressed bytes decompressed at a time by the reader
+READ_SIZE = 64 * 1024
+# Video IDs are printable ASCII, told apart from random bytes when looking
+# for the next record after a corrupted one
+_KEY = re.compile(rb"[\x21-\x7e]+")
+
+# Shared: json.dumps() with arguments builds a new encoder on every call
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def _encode_key(video_id):
+    key = video_id.encode("ascii")
+    if len(key) > KEY_SIZE:
+        raise ValueError(f"Video ID longer than {KEY_SIZE} bytes: {video_id}")
+    return key
+
+
+def _parse_lines(lines):
+    # The complete lines of a decompressed chunk are parsed as one JSON
+    # array: a single json.loads() call instead of one per segment
+    lines = lines.strip(b"\n")
+    if not lines:
+        return []
+    return json.loads(b"[" + lines.replace(b"\n", b",") + b"]")
+
+
+def _record_end(data, offset):
+    # End of the record at offset, None when it is incomplete or corrupted
+    if offset + RECORD_HEADER.size > len(data):
+        return None
+    key_length, payload_length, crc = RECORD_HEADER.unpack_from(data, offset)
+    start = offset + RECORD_HEADER.size + key_length
+    end = start + payload_length
+    if not 0 < key_length <= KEY_SIZE or end > len(data):
+        return None
+    if not _KEY.fullmatch(data[offset + RECORD_HEADER.size:start]) or zlib.crc32(data[start:end]) != crc:
+        return None
+    return end
+
+
+def _recover(path):
+    # Brings the files back to the last complete append: the index is cut to
+    # whole entries pointing to valid records, complete records written after
+    # the last indexed one are indexed, and the data file is truncated after
+    # them. Only the tail of the data file is read
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as data_file:
+        if os.fstat(data_file.fileno()).st_size <= len(DATA_MAGIC):
+            return
+        entries = []
+        index_path = path + INDEX_SUFFIX
+        current = None
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                current = f.read()
+            if current[:len(INDEX_MAGIC)] == INDEX_MAGIC:
+                whole = (len(current) - len(INDEX_MAGIC)) // INDEX_ENTRY.size * INDEX_ENTRY.size
+                entries = list(INDEX_ENTRY.iter_unpack(current[len(INDEX_MAGIC):len(INDEX_MAGIC) + whole]))
+        with mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(DATA_MAGIC)] != DATA_MAGIC:
+                raise ValueError(f"Not a transcript archive: {path}")
+            offset = len(DATA_MAGIC)
+            while entries:
+                end = _record_end(data, entries[-1][1])
+                if end is not None:
+                    offset = end
+                    break
+                entries.pop()
+            while (end := _record_end(data, offset)) is not None:
+                key_length = RECORD_HEADER.unpack_from(data, offset)[0]
+                entries.append((data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + key_length], offset))
+                offset = end
+            size = len(data)
+        if offset < size:
+            data_file.truncate(offset)
+    index = INDEX_MAGIC + b"".join(INDEX_ENTRY.pack(key, offset) for key, offset in entries)
+    if index != current:
+        temporary = index_path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(index)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, index_path)
+
+
+class TranscriptArchive:
+    def __init__(self, path):
+        self.path = path
+        _recover(path)
+        self._data = open(path, "ab")
+        if self._data.tell() == 0:
+            self._data.write(DATA_MAGIC)
+        self._index = open(path + INDEX_SUFFIX, "ab")
+        if self._index.tell() == 0:
+            self._index.write(INDEX_MAGIC)
+        self._lock = threading.Lock()
+
+    def append(self, video_id, segments):
+        # Returns the offset of the record
+        key = _encode_key(video_id)
+        lines = "".join(_encoder.encode(segment) + "\n" for segment in segments)
+        payload = zlib.compress(lines.encode("UTF-8"), COMPRESS_LEVEL)
+        header = RECORD_HEADER.pack(len(key), len(payload), zlib.crc32(payload))
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(header + key + payload)
+            self._data.flush()
+            # Indexed only once the record is written: an interrupted append
+            # leaves an unreferenced tail, never an entry pointing to nothing
+            self._index.write(INDEX_ENTRY.pack(key, offset))
+            self._index.flush()
+        return offset
+
+    def close(self):
+        with self._lock:
+            for f in (self._data, self._index):
+                os.fsync(f.fileno())
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArchiveReader:
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._offsets = {}
+        with open(path, "rb") as f:
+            # An empty file is an archive nothing was written to yet (mmap
+            # cannot map 0 bytes)
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(DATA_MAGIC)] != DATA_MAGIC:
+            self._data.close()
+            raise ValueError(f"Not a transcript archive: {path}")
+        if not os.path.exists(path + INDEX_SUFFIX):
+            # Lost index: rebuilt from the records of the data file
+            rebuild_index(path)
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            if os.fstat(f.fileno()).st_size > len(INDEX_MAGIC):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index, memoryview(index) as view:
+                    # A torn last entry is ignored
+                    end = len(INDEX_MAGIC) + (len(view) - len(INDEX_MAGIC)) // INDEX_ENTRY.size * INDEX_ENTRY.size
+                    for key, offset in INDEX_ENTRY.iter_unpack(view[len(INDEX_MAGIC):end]):
+                        self._offsets[key.rstrip(b"\0").decode("ascii")] = offset
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, video_id):
+        return video_id in self._offsets
+
+    def __iter__(self):
+        # (video_id, segments) of the latest record of every video, in file
+        # order so the data file is read sequentially
+        for video_id, offset in sorted(self._offsets.items(), key=lambda item: item[1]):
+            yield video_id, self._segments(offset)
+
+    def video_ids(self):
+        return list(self._offsets)
+
+    def segments(self, video_id):
+        return self._segments(self._offsets[video_id])
+
+    def _segments(self, offset):
+        key_length, payload_length, crc = RECORD_HEADER.unpack_from(self._data, offset)
+        start = offset + RECORD_HEADER.size + key_length
+        end = start + payload_length
+        if end > len(self._data):
+            raise ValueError(f"Truncated record at offset {offset} of {self.path}")
+        decompressor = zlib.decompressobj()
+        checksum = 0
+        pending = b""
+        try:
+            for position in range(start, end, READ_SIZE):
+                chunk = self._data[position:min(position + READ_SIZE, end)]
+                checksum = zlib.crc32(chunk, checksum)
+                pending += decompressor.decompress(chunk)
+                lines, _, pending = pending.rpartition(b"\n")
+                yield from _parse_lines(lines)
+            yield from _parse_lines(pending + decompressor.flush())
+        except (zlib.error, ValueError) as e:
+            # A damaged payload fails to decompress or to parse before its
+            # checksum can be compared
+            raise ValueError(f"Corrupted record at offset {offset} of {self.path}: {e}") from e
+        if checksum != crc:
+            raise ValueError(f"Corrupted record at offset {offset} of {self.path}")
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def rebuild_index(path):
+    # Rewrites the index from the records of the data file, e.g. after the
+    # index was lost. After an incomplete or corrupted record, the next valid
+    # one is looked for byte by byte, so the records that follow are kept.
+    # Returns the number of records indexed
+    entries = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:len(DATA_MAGIC)] != DATA_MAGIC:
+            raise ValueError(f"Not a transcript archive: {path}")
+        offset = len(DATA_MAGIC)
+        while offset + RECORD_HEADER.size <= len(data):
+            end = _record_end(data, offset)
+            if end is None:
+                offset += 1
+                continue
+            key_length = RECORD_HEADER.unpack_from(data, offset)[0]
+            entries.append(INDEX_ENTRY.pack(data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + key_length], offset))
+            offset = end
+    temporary = path + INDEX_SUFFIX + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(INDEX_MAGIC + b"".join(entries))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path + INDEX_SUFFIX)
+    return len(entries)
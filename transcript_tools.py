@@ -0,0 +1,172 @@
+"""Helpers working on transcript segments, as returned by ``fetched.to_raw_data()``."""
+import hashlib
+import os
+import re
+import tempfile
+from collections import deque
+
+# Rough number of characters per token, good enough to size prompts without a tokenizer
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+
+def estimate_tokens(text):
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def chunk_segments(segments, max_tokens):
+    # Groups segments into chunks of at most max_tokens, only cutting on segment
+    # boundaries (a single oversized segment becomes its own chunk)
+    chunk = []
+    chunk_tokens = 0
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        if chunk and chunk_tokens + tokens > max_tokens:
+            yield " ".join(chunk)
+            chunk = []
+            chunk_tokens = 0
+        chunk.append(text)
+        chunk_tokens += tokens
+    if chunk:
+        yield " ".join(chunk)
+
+
+# Non-speech markers of auto-captions ("[Music]", "[Applaudissements]", "♪")
+# and filler words, all paid for in input tokens. Fillers inside hyphenated
+# words ("uh-huh", "uh-oh") are words of their own and kept
+NON_SPEECH_PATTERN = re.compile(r"\[[^\]]*\]|♪+")
+FILLER_PATTERN = re.compile(r"(?<![\w-])(?:u+m+|u+h+|e+u+h+|h+m+|e+r+m+)(?![\w-])[,.]?", re.IGNORECASE)
+# Auto-captions roll: a segment often starts with the last words of the
+# previous one. Overlaps of MIN_OVERLAP_WORDS to MAX_OVERLAP_WORDS words are removed
+MIN_OVERLAP_WORDS = 2
+MAX_OVERLAP_WORDS = 20
+# Segments shorter than this are merged with the next one
+MIN_SEGMENT_WORDS = int(os.getenv("MIN_SEGMENT_WORDS", "6"))
+# Maximum size of the compacted transcript, 0 for no limit
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "0"))
+
+
+def normalize_word(word):
+    return word.strip(".,;:!?\"'()«»…-").lower()
+
+
+class TranscriptCompactor:
+    # Cleans the segments of a transcript before they are spooled and sent to
+    # the model, and counts the estimated tokens before and after. One
+    # instance per transcript:
+    #
+    #     compactor = TranscriptCompactor()
+    #     transcript = SpooledTranscript(compactor.compact(segments))
+
+    def __init__(self, token_budget=TRANSCRIPT_TOKEN_BUDGET, min_segment_words=MIN_SEGMENT_WORDS):
+        self.token_budget = token_budget
+        self.min_segment_words = min_segment_words
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.truncated = False
+        # Normalized last words kept so far, to find the next overlap
+        self._recent = deque(maxlen=MAX_OVERLAP_WORDS)
+
+    def compact(self, segments):
+        pending = []
+        for segment in segments:
+            self.tokens_before += estimate_tokens(segment["text"])
+            words = self._clean(segment["text"])
+            if not words:
+                continue
+            pending.extend(words)
+            if len(pending) >= self.min_segment_words:
+                yield from self._emit(pending)
+                pending = []
+        if pending:
+            yield from self._emit(pending)
+
+    def _clean(self, text):
+        text = FILLER_PATTERN.sub(" ", NON_SPEECH_PATTERN.sub(" ", text))
+        words = text.split()
+        normalized = [normalize_word(word) for word in words]
+        recent = list(self._recent)
+        for size in range(min(len(words), len(recent)), MIN_OVERLAP_WORDS - 1, -1):
+            if recent[-size:] == normalized[:size]:
+                words = words[size:]
+                normalized = normalized[size:]
+                break
+        self._recent.extend(normalized)
+        return words
+
+    def _emit(self, words):
+        if self.truncated:
+            return
+        text = " ".join(words)
+        tokens = estimate_tokens(text)
+        if self.token_budget and self.tokens_after + tokens > self.token_budget:
+            self.truncated = True
+            if self.tokens_after:
+                # Only whole segments are kept, the rest is dropped
+                return
+            # The first segment alone is over the budget: it is cut at the
+            # budget (at least one word) rather than leaving no transcript
+            length = len(words[0])
+            kept = 1
+            for word in words[1:]:
+                if estimate_tokens("x" * (length + 1 + len(word))) > self.token_budget:
+                    break
+                length += 1 + len(word)
+                kept += 1
+            text = " ".join(words[:kept])
+            tokens = estimate_tokens(text)
+        self.tokens_after += tokens
+        yield {"text": text}
+
+
+# Transcripts above this size are moved from memory to a private temporary file
+SPILL_THRESHOLD_BYTES = int(os.getenv("TRANSCRIPT_SPILL_BYTES", str(4 * 1024 * 1024)))
+
+
+class SpooledTranscript:
+    # Segment texts, one per line, kept in memory until they exceed
+    # spill_threshold bytes and then in an anonymous temporary file unique to
+    # this transcript. The SHA-256 and the token estimate of the joined text
+    # are computed while spooling, so the text never has to be held twice
+
+    def __init__(self, segments, spill_threshold=SPILL_THRESHOLD_BYTES):
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=spill_threshold, mode="w+", encoding="UTF-8", prefix="transcript-"
+        )
+        digest = hashlib.sha256()
+        self.count = 0
+        self.tokens = 0
+        for segment in segments:
+            # Captions may contain line breaks, they would break the one line
+            # per segment layout
+            text = " ".join(segment["text"].split())
+            if not text:
+                continue
+            digest.update(((" " if self.count else "") + text).encode("UTF-8"))
+            self._file.write(text + "\n")
+            self.count += 1
+            self.tokens += estimate_tokens(text)
+        self.sha256 = digest.hexdigest()
+
+    @property
+    def spilled(self):
+        return self._file._rolled
+
+    def segments(self):
+        self._file.seek(0)
+        for line in self._file:
+            yield {"text": line.rstrip("\n")}
+
+    def text(self):
+        return " ".join(segment["text"] for segment in self.segments())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()